@@ -1,14 +1,31 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import pickle
 import os
 import json
+import hmac
+import threading
+import time
+import uuid
 import numpy as np
 from werkzeug.utils import secure_filename
 
 from config import Config
-from models.feature_extractor import FeatureExtractor
+from models.feature_extractor import FeatureExtractor, decode_image_bytes, import_tensorflow
+from models.batching import MicroBatcher
+from models.backbones import get_backbone
 from utils.similarity_search import SimilaritySearch
+from utils.ann_index import IVFIndex
+from utils.quantization import load_compressed_store
+from utils.monitoring import StartupTimer
+from utils.catalog import ProductCatalog, freeze_products
+from utils.search_state import SearchState, SearchStateManager, files_version, files_modified_at
+from utils.embedding_cache import EmbeddingCache
+from utils.text_index import TextIndex
+from utils.neighbours import NeighbourTable
+from utils.database import ProductDatabase
+from utils.projection import PCAProjection
+from utils.manifest import load_manifest
 
 app = Flask(__name__)
 CORS(app)  # Permettre les requêtes depuis le frontend
@@ -20,38 +37,421 @@ app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 # Créer le dossier uploads s'il n'existe pas
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
+def index_files():
+    """
+    Fichiers composant l'index servi (leur version déclenche le rechargement à chaud)
+    """
+    return [
+        Config.METADATA_FILE, os.path.join(Config.DATA_DIR, 'metadata_preprocessed.json'),
+        Config.FEATURES_MATRIX_FILE, Config.IMAGE_PATHS_FILE, Config.PRODUCTS_TABLE_FILE,
+        Config.IVF_INDEX_FILE, Config.INT8_STORE_FILE, Config.PQ_STORE_FILE,
+        Config.NEIGHBOURS_META_FILE, Config.PROJECTION_FILE, Config.FEATURES_MANIFEST_FILE
+    ]
+
+def check_index_model(index_dimension):
+    """
+    Refuser un index produit par un autre modèle que Config.MODEL_NAME :
+    ses vecteurs ne sont pas comparables à ceux des requêtes
+    
+    Args:
+        index_dimension (int): Dimension des vecteurs du modèle dans l'index (avant projection)
+        
+    Raises:
+        ValueError: Si le manifest ou la dimension ne correspondent pas au modèle configuré
+    """
+    manifest = load_manifest(Config.FEATURES_MANIFEST_FILE)
+    if manifest is not None and manifest.get('model') != Config.MODEL_NAME:
+        raise ValueError(
+            f"Index construit avec {manifest.get('model')}, modèle configuré {Config.MODEL_NAME} : "
+            f"reconstruire l'index (build_features_database.py)"
+        )
+    
+    # Index sans manifest (anciennes constructions) : seule la dimension est vérifiable
+    model_dimension = get_backbone(Config.MODEL_NAME).output_dim
+    if index_dimension != model_dimension:
+        raise ValueError(
+            f"Dimension de l'index {index_dimension} != {model_dimension} ({Config.MODEL_NAME})"
+        )
+
+def load_search_state(timer=None):
+    """
+    Charger une version complète de l'index : métadonnées, features,
+    table des produits, index IVF et stockage compressé
+    
+    Args:
+        timer (StartupTimer): Mesure des étapes (démarrage uniquement)
+        
+    Returns:
+        SearchState: Version prête à servir les requêtes
+    """
+    version = files_version(index_files())
+    modified_at = files_modified_at(index_files())
+    
+    # Charger les métadonnées
+    metadata_file = os.path.join(Config.DATA_DIR, 'metadata_preprocessed.json')
+    if not os.path.exists(metadata_file):
+        metadata_file = Config.METADATA_FILE
+    
+    if Config.METADATA_DB:
+        # Base SQLite (reconstruite si le JSON a changé) : produits lus à la demande
+        catalog_products = ProductDatabase.from_json(metadata_file)
+        text_index = TextIndex(catalog_products.select(TextIndex.FIELDS))
+        categories = catalog_products.categories()
+    else:
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            products_metadata = json.load(f)
+        
+        # Vues en lecture seule (URL des images calculée une seule fois), partagées par les requêtes
+        catalog_products = freeze_products(products_metadata['products'])
+        text_index = TextIndex(catalog_products)
+        categories = sorted({product['category'] for product in catalog_products if product.get('category') is not None})
+    
+    print(f"   ✅ {len(catalog_products)} produits chargés ({len(text_index.vocabulary)} mots indexés)")
+    if timer is not None:
+        timer.stage('métadonnées')
+    
+    # Charger les features
+    compressed_store = None
+    store_file = {'int8': Config.INT8_STORE_FILE, 'pq': Config.PQ_STORE_FILE}.get(Config.FEATURES_STORAGE)
+    
+    if store_file and os.path.exists(store_file):
+        # Mode compressé : seuls les codes sont en mémoire, la matrice float32
+        # est lue depuis le disque (memmap) pour re-classer la short-list
+        compressed_store = load_compressed_store(store_file)
+        features_matrix = np.load(Config.FEATURES_MATRIX_FILE, mmap_mode='r')
+        if len(compressed_store.codes) == features_matrix.shape[0] \
+                and compressed_store.dimension == features_matrix.shape[1]:
+            print(f"   ✅ Stockage {compressed_store.kind} chargé : {compressed_store.nbytes / (1024*1024):.2f} MB")
+        else:
+            # Fichier d'une ancienne construction : ses codes ne correspondent plus à la matrice
+            print(f"   ⚠️  Stockage {compressed_store.kind} obsolète (matrice modifiée), features float32 utilisées")
+            compressed_store = None
+    
+    if compressed_store is None:
+        if store_file and not os.path.exists(store_file):
+            print(f"   ⚠️  Stockage {Config.FEATURES_STORAGE} introuvable, features float32 utilisées")
+        # En memmap, les pages de la matrice sont partagées entre les workers
+        # via le cache du système au lieu d'être copiées dans chaque processus.
+        # Les fichiers étant remplacés (os.replace) et non réécrits, une version
+        # en cours d'utilisation reste lisible après un rechargement.
+        features_matrix = np.load(Config.FEATURES_MATRIX_FILE, mmap_mode='r' if Config.FEATURES_MMAP else None)
+    
+    with open(Config.IMAGE_PATHS_FILE, 'rb') as f:
+        image_paths = pickle.load(f)
+    
+    print(f"   ✅ Features chargées : {features_matrix.shape}{' (memmap)' if isinstance(features_matrix, np.memmap) else ''}")
+    
+    # Table des produits alignée sur les lignes de la matrice
+    if os.path.exists(Config.PRODUCTS_TABLE_FILE):
+        product_catalog = ProductCatalog.load(Config.PRODUCTS_TABLE_FILE)
+    else:
+        print("   ⚠️  Table des produits introuvable, alignement reconstruit depuis les métadonnées")
+        product_catalog = ProductCatalog.from_metadata(catalog_products, image_paths)
+    product_catalog.check_alignment(image_paths, features_matrix.shape[0])
+    
+    # Projection PCA de la construction : appliquée aux vecteurs de requête
+    projection = None
+    if os.path.exists(Config.PROJECTION_FILE):
+        projection = PCAProjection.load(Config.PROJECTION_FILE)
+        if projection.dim != features_matrix.shape[1]:
+            raise ValueError(
+                f"Projection PCA ({projection.dim}) incompatible avec la matrice ({features_matrix.shape[1]})"
+            )
+        print(f"   ✅ Projection PCA chargée : {projection.input_dim} -> {projection.dim}")
+    
+    check_index_model(features_matrix.shape[1] if projection is None else projection.input_dim)
+    if timer is not None:
+        timer.stage('features')
+    
+    search_index = None
+    if Config.SEARCH_INDEX == 'ivf':
+        if os.path.exists(Config.IVF_INDEX_FILE):
+            search_index = IVFIndex.load(Config.IVF_INDEX_FILE, nprobe=Config.IVF_NPROBE)
+            if search_index.matches(*features_matrix.shape):
+                print(f"   ✅ Index IVF chargé : {search_index.n_lists} listes, nprobe={search_index.nprobe}")
+            else:
+                # Fichier d'une ancienne construction : ses lignes ne correspondent plus à la matrice
+                print("   ⚠️  Index IVF obsolète (matrice modifiée), recherche exacte utilisée")
+                search_index = None
+        else:
+            print("   ⚠️  Index IVF introuvable, recherche exacte utilisée")
+    
+    similarity_search = SimilaritySearch(
+        features_matrix, image_paths, metric='cosine', index=search_index,
+        store=compressed_store, rerank_factor=Config.RERANK_FACTOR,
+        exact_subset_max=Config.FILTER_EXACT_MAX_ROWS,
+        # Lignes supprimées par une mise à jour incrémentale (exclues des résultats)
+        deleted=product_catalog.deleted
+    )
+    # Produits similaires précalculés (build_neighbours.py), ignorés s'ils datent d'une autre matrice
+    neighbours = None
+    if os.path.exists(Config.NEIGHBOURS_META_FILE):
+        neighbours = NeighbourTable.load(
+            Config.NEIGHBOURS_ROWS_FILE, Config.NEIGHBOURS_SCORES_FILE, Config.NEIGHBOURS_META_FILE,
+            mmap=Config.FEATURES_MMAP
+        )
+        if neighbours.source_version != files_version([Config.FEATURES_MATRIX_FILE]) \
+                or len(neighbours) != features_matrix.shape[0]:
+            print("   ⚠️  Produits similaires obsolètes (matrice modifiée) : relancez build_neighbours.py")
+            neighbours = None
+        else:
+            print(f"   ✅ Produits similaires chargés : {neighbours.k} voisins par produit")
+    
+    if timer is not None:
+        timer.stage('moteur de recherche')
+    
+    return SearchState(version, similarity_search, product_catalog, catalog_products,
+                       text_index, neighbours, categories, modified_at, projection)
+
 # Charger les données au démarrage
+startup_timer = StartupTimer()
 print("🚀 Démarrage de l'API...")
 print("📂 Chargement des données...")
 
-# Charger les métadonnées
-metadata_file = os.path.join(Config.DATA_DIR, 'metadata_preprocessed.json')
-if not os.path.exists(metadata_file):
-    metadata_file = Config.METADATA_FILE
-
-with open(metadata_file, 'r', encoding='utf-8') as f:
-    products_metadata = json.load(f)
-
-print(f"   ✅ {products_metadata['total_products']} produits chargés")
-
-# Charger les features
-with open(Config.FEATURES_MATRIX_FILE.replace('.npy', '') + '.npy', 'rb') as f:
-    features_matrix = np.load(f)
-
-with open(Config.IMAGE_PATHS_FILE, 'rb') as f:
-    image_paths = pickle.load(f)
+# Version courante de l'index, rechargeable à chaud (/api/admin/reload ou surveillance des fichiers)
+search_state = SearchStateManager(
+    load_search_state,
+    lambda: files_version(index_files()),
+    initial=load_search_state(startup_timer)
+)
+if Config.INDEX_WATCH_INTERVAL:
+    search_state.watch(Config.INDEX_WATCH_INTERVAL)
+
+# Modèle (et TensorFlow) chargé selon Config.MODEL_LOADING : les routes sans
+# modèle (produits, catégories, texte) répondent dès que l'index est chargé
+feature_extractor = None
+micro_batcher = None
+model_error = None
+model_profile = None
+model_lock = threading.Lock()
+
+def load_model(timer=None):
+    """
+    Charger le modèle une seule fois par worker : import de TensorFlow,
+    construction du modèle, préchauffage (Config.MODEL_WARMUP), micro-batcher
+    
+    Args:
+        timer (StartupTimer): Mesure des étapes (chargement pendant le démarrage uniquement)
+        
+    Returns:
+        tuple: (feature_extractor, micro_batcher)
+        
+    Raises:
+        Exception: Si le modèle ne peut pas être chargé (nouvel essai au prochain appel)
+    """
+    global feature_extractor, micro_batcher, model_error, model_profile
+    
+    if feature_extractor is not None:
+        return feature_extractor, micro_batcher
+    
+    with model_lock:
+        if feature_extractor is not None:
+            return feature_extractor, micro_batcher
+        
+        profile = {}
+        
+        def step(name, start):
+            profile[name] = round((time.perf_counter() - start) * 1000, 1)
+            if timer is not None:
+                timer.stage(name)
+        
+        try:
+            start = time.perf_counter()
+            import_tensorflow()
+            step('import tensorflow', start)
+            
+            start = time.perf_counter()
+            extractor = FeatureExtractor(Config.MODEL_NAME)
+            step('modèle', start)
+            
+            if Config.MODEL_WARMUP:
+                start = time.perf_counter()
+                extractor.warmup()
+                step('préchauffage', start)
+        except Exception as e:
+            model_error = str(e)
+            raise
+        
+        if Config.MICRO_BATCHING:
+            micro_batcher = MicroBatcher(extractor, Config.BATCH_MAX_SIZE, Config.BATCH_MAX_WAIT_MS)
+        model_profile = profile
+        model_error = None
+        # Affecté en dernier : un modèle visible est prêt à servir
+        feature_extractor = extractor
+    
+    print(f"✅ Modèle prêt en {sum(profile.values()) / 1000:.2f} s")
+    return feature_extractor, micro_batcher
 
-print(f"   ✅ Features chargées : {features_matrix.shape}")
+def warmup_model(timer=None):
+    """
+    Hook de préchauffage : charger le modèle avant la première recherche par image.
+    Appelé au démarrage selon Config.MODEL_LOADING, ou depuis un hook du serveur
+    (ex. post_worker_init de gunicorn avec MODEL_LOADING = 'lazy')
+    
+    Returns:
+        bool: True si le modèle est prêt
+    """
+    try:
+        load_model(timer)
+        return True
+    except Exception as e:
+        print(f"❌ Échec du chargement du modèle : {e}")
+        return False
 
-# Initialiser les modules
-feature_extractor = FeatureExtractor(Config.MODEL_NAME)
-similarity_search = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+def start_background_loading():
+    threading.Thread(target=warmup_model, name='model-loader', daemon=True).start()
 
-print("✅ API prête !\n")
+def reset_model_after_fork():
+    """
+    Remettre l'état du modèle en ordre dans un processus fils (ex. worker de
+    gunicorn --preload) : les threads du parent n'y existent pas, et le verrou
+    a pu être copié pendant que le thread de chargement le tenait
+    """
+    global model_lock, model_error, micro_batcher
+    model_lock = threading.Lock()
+    
+    if feature_extractor is None:
+        # Chargement inachevé dans le parent : repris par ce processus
+        model_error = None
+        if Config.MODEL_LOADING == 'background':
+            start_background_loading()
+    elif micro_batcher is not None:
+        # Le thread du micro-batcher du parent n'a pas été copié
+        micro_batcher = MicroBatcher(feature_extractor, Config.BATCH_MAX_SIZE, Config.BATCH_MAX_WAIT_MS)
+
+def reset_index_after_fork():
+    """
+    Relancer la surveillance de l'index dans un processus fils : le thread
+    du parent n'a pas été copié
+    """
+    search_state.reset_after_fork()
+    if Config.INDEX_WATCH_INTERVAL:
+        search_state.watch(Config.INDEX_WATCH_INTERVAL)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_index_after_fork)
+    os.register_at_fork(after_in_child=reset_model_after_fork)
+
+if Config.MODEL_LOADING == 'startup':
+    warmup_model(startup_timer)
+elif Config.MODEL_LOADING == 'background':
+    start_background_loading()
+elif Config.MODEL_LOADING != 'lazy':
+    raise ValueError(f"Mode de chargement du modèle inconnu : {Config.MODEL_LOADING}")
+
+embedding_cache = None
+if Config.EMBEDDING_CACHE_SIZE:
+    embedding_cache = EmbeddingCache(
+        f'{Config.MODEL_NAME}:{Config.INFERENCE_BACKEND}',
+        max_entries=Config.EMBEDDING_CACHE_SIZE,
+        ttl=Config.EMBEDDING_CACHE_TTL,
+        disk_dir=Config.EMBEDDING_CACHE_DIR,
+        disk_max_entries=Config.EMBEDDING_CACHE_DISK_MAX,
+        cache_results=Config.CACHE_SEARCH_RESULTS
+    )
+
+startup_timer.report()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def extract_upload_features(data, filename, cache_key=None):
+    """
+    Extraire les features d'une image envoyée
+    
+    Par défaut l'image est décodée en mémoire. Avec Config.SAVE_UPLOADS (debug),
+    elle est d'abord sauvegardée dans le dossier uploads puis relue depuis le disque.
+    Une image déjà vue (même contenu) est servie par le cache sans passer dans le modèle.
+    
+    Args:
+        data (bytes): Contenu du fichier reçu
+        filename (str): Nom du fichier reçu
+        cache_key (str): Clé de l'image dans embedding_cache (None = pas de cache)
+        
+    Returns:
+        numpy.ndarray: Vecteur de features, None en cas d'échec
+    """
+    if cache_key is not None:
+        cached = embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    feature_extractor, micro_batcher = load_model()
+    
+    if not Config.SAVE_UPLOADS:
+        if micro_batcher is None:
+            features = feature_extractor.extract_features_from_bytes(data)
+        else:
+            # Décodage dans le thread de la requête, inférence regroupée avec les autres requêtes
+            try:
+                img_array = decode_image_bytes(data)
+            except Exception as e:
+                print(f"❌ Erreur lors du décodage de {filename}: {e}")
+                return None
+            features = micro_batcher.submit(img_array)
+    else:
+        # Préfixe unique : deux utilisateurs peuvent envoyer le même nom de fichier
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{secure_filename(filename)}")
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        
+        try:
+            features = feature_extractor.extract_features(filepath)
+        finally:
+            os.remove(filepath)
+    
+    if cache_key is not None and features is not None:
+        embedding_cache.put(cache_key, features)
+    return features
+
+def parse_search_filters(args):
+    """
+    Lire les filtres d'une recherche par image
+    Query params: category (une ou plusieurs, séparées par des virgules),
+                  min_price, max_price, in_stock (1/0)
+    
+    Args:
+        args (MultiDict): Paramètres de la requête
+        
+    Returns:
+        dict: Arguments de ProductCatalog.filter_rows
+        
+    Raises:
+        ValueError: Si un paramètre est invalide
+    """
+    categories = [c.strip() for value in args.getlist('category') for c in value.split(',') if c.strip()]
+    in_stock = args.get('in_stock')
+    if in_stock is not None and in_stock.lower() not in ('1', '0', 'true', 'false'):
+        raise ValueError('in_stock must be 1 or 0')
+    
+    return {
+        'categories': tuple(categories) if categories else None,
+        'min_price': float(args['min_price']) if args.get('min_price') else None,
+        'max_price': float(args['max_price']) if args.get('max_price') else None,
+        'in_stock': in_stock.lower() in ('1', 'true') if in_stock is not None else None
+    }
+
+def enrich_results(similar_results, product_catalog):
+    """
+    Associer chaque résultat de recherche au produit correspondant
+    (accès direct par numéro de ligne dans la table des produits)
+    
+    Args:
+        similar_results (list[SearchResult]): Résultats de SimilaritySearch
+        product_catalog (ProductCatalog): Table de la version ayant produit les résultats
+        
+    Returns:
+        list: Produits enrichis (image_url, similarity, rank)
+    """
+    results = []
+    for rank, result in enumerate(similar_results, start=1):
+        product = product_catalog[result.row]
+        
+        if product is not None:
+            results.append({**product, 'similarity': result.score, 'rank': rank})
+    
+    return results
+
 @app.route('/')
 def home():
     return jsonify({
@@ -60,7 +460,11 @@ def home():
         'endpoints': {
             'random_products': '/api/products/random',
             'search_by_image': '/api/search/image',
-            'all_products': '/api/products/all'
+            'search_by_images': '/api/search/images',
+            'all_products': '/api/products/all',
+            'similar_products': '/api/products/<id>/similar',
+            'metrics': '/api/metrics',
+            'reload_index': '/api/admin/reload'
         }
     })
 
@@ -71,27 +475,11 @@ def get_random_products():
     """
     import random
     
+    catalog_products = search_state.current.catalog_products
     count = int(request.args.get('count', 20))
-    count = min(count, len(products_metadata['products']))
+    count = min(count, len(catalog_products))
     
-    random_products = random.sample(products_metadata['products'], count)
-    
-    # Ajouter l'URL complète des images
-    for product in random_products:
-        # Convertir le chemin absolu en chemin relatif pour l'URL
-        img_path = product['image_path']
-        
-        # Extraire le chemin relatif (à partir de 'data/')
-        if 'data\\products\\' in img_path or 'data/products/' in img_path:
-            relative_path = img_path.split('data\\products\\')[-1].replace('\\', '/')
-            if 'data/products/' in img_path:
-                relative_path = img_path.split('data/products/')[-1]
-            product['image_url'] = f'/images/products/{relative_path}'
-        elif 'data\\preprocessed\\' in img_path or 'data/preprocessed/' in img_path:
-            relative_path = img_path.split('data\\preprocessed\\')[-1].replace('\\', '/')
-            if 'data/preprocessed/' in img_path:
-                relative_path = img_path.split('data/preprocessed/')[-1]
-            product['image_url'] = f'/images/preprocessed/{relative_path}'
+    random_products = random.sample(catalog_products, count)
     
     return jsonify({
         'success': True,
@@ -99,38 +487,200 @@ def get_random_products():
         'products': random_products
     })
 
+def set_cache_validators(response, state):
+    """
+    En-têtes de validation liés à la version de l'index (ETag, Last-Modified) :
+    un client ou un proxy revalide sa copie au lieu de retélécharger le catalogue
+    
+    Args:
+        response (Response): Réponse à compléter
+        state (SearchState): Version de l'index servie
+        
+    Returns:
+        Response: La même réponse
+    """
+    response.set_etag(state.version)
+    response.last_modified = state.modified_at
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified(state):
+    """
+    Réponse 304 si la copie du client correspond à la version servie
+    (If-None-Match / If-Modified-Since), None sinon
+    """
+    response = set_cache_validators(app.response_class(), state)
+    response.make_conditional(request)
+    return response if response.status_code == 304 else None
+
+def select_fields(products, fields):
+    """
+    Garder quelques champs de chaque produit (paramètre fields=id,name,...)
+    
+    Args:
+        products (list): Produits de la page
+        fields (list): Champs demandés (None = produits complets)
+        
+    Returns:
+        list: Produits (sous-dictionnaires si des champs sont demandés)
+    """
+    if not fields:
+        return products
+    return [{field: product[field] for field in fields if field in product}
+            for product in products if product is not None]
+
 @app.route('/api/products/all', methods=['GET'])
 def get_all_products():
     """
-    Retourner tous les produits
+    Retourner les produits du catalogue, page par page
+    Query params: limit (défaut 100, max 1000), offset (défaut 0) ou cursor (next_cursor
+                  de la page précédente, lié à la version de l'index : refusé (400) après
+                  un rechargement, la pagination reprend alors à offset=0),
+                  fields (champs séparés par des virgules),
+                  format (ndjson = tout le catalogue à partir de offset/cursor en streaming,
+                  un produit par ligne, lu par blocs)
+    Réponses conditionnelles : ETag / Last-Modified liés à la version de l'index (304)
     """
-    # Ajouter l'URL complète des images
-    all_products = products_metadata['products'].copy()
+    state = search_state.current
+    catalog_products = state.catalog_products
+    total = len(catalog_products)
     
-    for product in all_products:
-        img_path = product['image_path']
+    cursor = request.args.get('cursor')
+    try:
+        if cursor:
+            # Curseur "version:position" : une page d'une autre version sauterait ou répéterait des produits
+            version, _, position = cursor.rpartition(':')
+            if version != state.version:
+                return jsonify({'error': 'Cursor from another index version, restart from offset 0'}), 400
+            start = int(position)
+        else:
+            start = int(request.args.get('offset', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return jsonify({'error': 'limit, offset and cursor position must be integers'}), 400
+    start = min(max(start, 0), total)
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    
+    response = not_modified(state)
+    if response is not None:
+        return response
+    
+    if request.args.get('format') == 'ndjson':
+        stop = total if limit is None else min(start + max(limit, 0), total)
+        
+        def generate():
+            # La version lue au début de la requête est servie jusqu'au bout
+            for block_start in range(start, stop, Config.PRODUCTS_STREAM_BATCH):
+                block = catalog_products[block_start:min(block_start + Config.PRODUCTS_STREAM_BATCH, stop)]
+                yield ''.join(json.dumps(product) + '\n' for product in select_fields(block, fields)
+                              if product is not None)
         
-        if 'data\\products\\' in img_path or 'data/products/' in img_path:
-            relative_path = img_path.split('data\\products\\')[-1].replace('\\', '/')
-            if 'data/products/' in img_path:
-                relative_path = img_path.split('data/products/')[-1]
-            product['image_url'] = f'/images/products/{relative_path}'
-        elif 'data\\preprocessed\\' in img_path or 'data/preprocessed/' in img_path:
-            relative_path = img_path.split('data\\preprocessed\\')[-1].replace('\\', '/')
-            if 'data/preprocessed/' in img_path:
-                relative_path = img_path.split('data/preprocessed/')[-1]
-            product['image_url'] = f'/images/preprocessed/{relative_path}'
+        response = Response(generate(), mimetype='application/x-ndjson')
+        response.headers['X-Total-Count'] = str(total)
+        return set_cache_validators(response, state)
+    
+    limit = min(max(limit if limit is not None else Config.PRODUCTS_PAGE_SIZE, 1), Config.PRODUCTS_MAX_LIMIT)
+    stop = min(start + limit, total)
+    products = select_fields(list(catalog_products[start:stop]), fields)
+    
+    return set_cache_validators(jsonify({
+        'success': True,
+        'total': total,
+        'offset': start,
+        'limit': limit,
+        'count': len(products),
+        'has_more': stop < total,
+        'next_cursor': f'{state.version}:{stop}' if stop < total else None,
+        'products': products
+    }), state)
+
+@app.route('/api/products/<int:product_id>/similar', methods=['GET'])
+def get_similar_products(product_id):
+    """
+    Produits similaires à un produit du catalogue (table précalculée, sans calcul)
+    Query params: top_k (défaut 10, ramené entre 1 et le nombre de voisins de la table)
+    """
+    state = search_state.current
+    
+    if state.neighbours is None:
+        return jsonify({'error': 'Similar products not available (run build_neighbours.py)'}), 503
+    
+    row = state.product_catalog.row_of_id.get(product_id)
+    if row is None:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    try:
+        top_k = min(max(int(request.args.get('top_k', 10)), 1), state.neighbours.k)
+    except ValueError:
+        return jsonify({'error': 'top_k must be an integer'}), 400
+    rows, scores = state.neighbours.neighbours(row, top_k, deleted=state.similarity_search.deleted)
+    
+    results = []
+    for rank, (neighbour_row, score) in enumerate(zip(rows.tolist(), scores.tolist()), start=1):
+        results.append({**state.product_catalog[neighbour_row], 'similarity': score, 'rank': rank})
     
     return jsonify({
         'success': True,
-        'total': len(all_products),
-        'products': all_products
+        'product': state.product_catalog[row],
+        'count': len(results),
+        'results': results
     })
 
+def search_image(data, filename, top_k, filters):
+    """
+    Recherche par image (extraction des features, recherche, enrichissement),
+    partagée par la route Flask et le mode asynchrone (asgi.py)
+    
+    Args:
+        data (bytes): Contenu de l'image envoyée
+        filename (str): Nom du fichier reçu
+        top_k (int): Nombre de résultats
+        filters (dict): Filtres lus par parse_search_filters
+        
+    Returns:
+        tuple: (corps de la réponse JSON, code HTTP)
+    """
+    cache_key = embedding_cache.key(data) if embedding_cache is not None else None
+    
+    # Même version de l'index jusqu'à la réponse
+    state = search_state.current
+    
+    # Lignes autorisées par les filtres (None = tout le catalogue)
+    subset = state.product_catalog.filter_rows(**filters)
+    search_params = (top_k, tuple(filters.values()))
+    
+    similar_results = None
+    if cache_key is not None:
+        similar_results = embedding_cache.get_results(cache_key, state.version, search_params)
+    
+    if similar_results is None:
+        # Extraire les features
+        query_features = extract_upload_features(data, filename, cache_key)
+        
+        if query_features is None:
+            return {'error': 'Failed to extract features'}, 500
+        
+        # Rechercher les produits similaires (dans l'espace projeté de l'index)
+        similar_results = state.similarity_search.find_similar(state.project(query_features), top_k, subset=subset)
+        if cache_key is not None:
+            embedding_cache.put_results(cache_key, state.version, search_params, similar_results)
+    
+    # Enrichir avec les métadonnées des produits
+    results = enrich_results(similar_results, state.product_catalog)
+    
+    return {
+        'success': True,
+        'count': len(results),
+        'filters': {name: value for name, value in filters.items() if value is not None},
+        'results': results
+    }, 200
+
 @app.route('/api/search/image', methods=['POST'])
 def search_by_image():
     """
     Rechercher des produits similaires à partir d'une image
+    Query params: top_k, category, min_price, max_price, in_stock (voir parse_search_filters)
     """
     if 'image' not in request.files:
         return jsonify({'error': 'No image provided'}), 400
@@ -140,69 +690,101 @@ def search_by_image():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
+    try:
+        filters = parse_search_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    
     if file and allowed_file(file.filename):
-        # Sauvegarder l'image
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
         try:
-            # Extraire les features
-            query_features = feature_extractor.extract_features(filepath)
-            
-            if query_features is None:
-                os.remove(filepath)
-                return jsonify({'error': 'Failed to extract features'}), 500
-            
-            # Rechercher les produits similaires
             top_k = int(request.args.get('top_k', 10))
-            similar_results = similarity_search.find_similar(query_features, top_k)
-            
-            # Enrichir avec les métadonnées des produits
-            results = []
-            for result in similar_results:
-                # Trouver le produit correspondant
-                matching_product = None
-                for product in products_metadata['products']:
-                    if product['image_path'] == result[0]:  # Utiliser result[0] pour le chemin de l'image
-                        matching_product = product.copy()
-                        break
-                
-                if matching_product:
-                    # Ajouter l'URL de l'image
-                    img_path = matching_product['image_path']
-                    
-                    if 'data\\products\\' in img_path or 'data/products/' in img_path:
-                        relative_path = img_path.split('data\\products\\')[-1].replace('\\', '/')
-                        if 'data/products/' in img_path:
-                            relative_path = img_path.split('data/products/')[-1]
-                        matching_product['image_url'] = f'/images/products/{relative_path}'
-                    elif 'data\\preprocessed\\' in img_path or 'data/preprocessed/' in img_path:
-                        relative_path = img_path.split('data\\preprocessed\\')[-1].replace('\\', '/')
-                        if 'data/preprocessed/' in img_path:
-                            relative_path = img_path.split('data/preprocessed/')[-1]
-                        matching_product['image_url'] = f'/images/preprocessed/{relative_path}'
-                    
-                    # Convertir les valeurs float32 en float
-                    matching_product['similarity'] = float(result[1])  # Convertir en float
-                    matching_product['rank'] = similar_results.index(result) + 1  # Ajouter le rang
-                    results.append(matching_product)
-            
-            # Nettoyer
-            os.remove(filepath)
+            payload, status = search_image(file.read(), file.filename, top_k, filters)
+            return jsonify(payload), status
+        
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'error': 'Invalid file type'}), 400
+
+@app.route('/api/search/images', methods=['POST'])
+def search_by_images():
+    """
+    Rechercher des produits similaires pour plusieurs images en une seule requête
+    (un seul passage du modèle et un seul produit matriciel pour tout le lot)
+    """
+    files = request.files.getlist('images')
+    
+    if len(files) == 0:
+        return jsonify({'error': 'No images provided'}), 400
+    
+    if len(files) > Config.MAX_BATCH_IMAGES:
+        return jsonify({'error': f'Too many images (max {Config.MAX_BATCH_IMAGES})'}), 400
+    
+    for file in files:
+        if file.filename == '' or not allowed_file(file.filename):
+            return jsonify({'error': f'Invalid file: {file.filename}'}), 400
+    
+    try:
+        filters = parse_search_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    
+    contents = [file.read() for file in files]
+    cache_keys = [None] * len(files)
+    query_features = [None] * len(files)
+    if embedding_cache is not None:
+        cache_keys = [embedding_cache.key(data) for data in contents]
+        query_features = [embedding_cache.get(key) for key in cache_keys]
+    
+    # Décoder en mémoire les images absentes du cache
+    missing = [i for i, features in enumerate(query_features) if features is None]
+    images = []
+    for i in missing:
+        try:
+            images.append(decode_image_bytes(contents[i]))
+        except Exception:
+            return jsonify({'error': f'Invalid image: {files[i].filename}'}), 400
+    
+    try:
+        # Extraire les features du lot (un seul passage du modèle)
+        if images:
+            feature_extractor, micro_batcher = load_model()
+            if micro_batcher is not None:
+                extracted = micro_batcher.submit_many(images)
+            else:
+                extracted = feature_extractor.extract_features_from_array(np.stack(images))
             
-            return jsonify({
-                'success': True,
+            for i, features in zip(missing, extracted):
+                query_features[i] = features
+                if cache_keys[i] is not None:
+                    embedding_cache.put(cache_keys[i], features)
+        query_features = np.stack(query_features)
+        
+        # Rechercher les produits similaires pour toutes les requêtes
+        state = search_state.current
+        top_k = int(request.args.get('top_k', 10))
+        batch_results = state.similarity_search.find_similar_batch(
+            state.project(query_features), top_k, chunk_size=Config.SEARCH_CHUNK_SIZE,
+            subset=state.product_catalog.filter_rows(**filters)
+        )
+        
+        queries = []
+        for file, similar_results in zip(files, batch_results):
+            results = enrich_results(similar_results, state.product_catalog)
+            queries.append({
+                'filename': file.filename,
                 'count': len(results),
                 'results': results
             })
         
-        except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return jsonify({'error': str(e)}), 500
+        return jsonify({
+            'success': True,
+            'count': len(queries),
+            'queries': queries
+        })
     
-    return jsonify({'error': 'Invalid file type'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # Servir les images statiques
 @app.route('/images/products/<path:filename>')
@@ -223,7 +805,9 @@ def serve_preprocessed_image(filename):
 def search_by_text():
     """
     Rechercher des produits par texte (nom, catégorie, description)
-    Query params: query (string)
+    via l'index inversé, résultats triés par pertinence (BM25)
+    Query params: query (string), limit (défaut 20, max 100), offset (défaut 0),
+                  prefix (1 = mots complétés par préfixe pour la saisie en cours, défaut 1)
     """
     query = request.args.get('query', '').strip().lower()
     
@@ -231,43 +815,24 @@ def search_by_text():
         return jsonify({'error': 'Query parameter is required'}), 400
     
     try:
-        # Rechercher dans les produits
-        results = []
-        
-        for product in products_metadata['products']:
-            # Rechercher dans: nom, catégorie, description
-            searchable_text = (
-                product.get('name', '').lower() + ' ' +
-                product.get('category', '').lower() + ' ' +
-                product.get('description', '').lower()
-            )
-            
-            # Si la requête est dans le texte recherchable
-            if query in searchable_text:
-                product_copy = product.copy()
-                
-                # Ajouter l'URL de l'image
-                img_path = product_copy['image_path']
-                
-                if 'data\\products\\' in img_path or 'data/products/' in img_path:
-                    relative_path = img_path.split('data\\products\\')[-1].replace('\\', '/')
-                    if 'data/products/' in img_path:
-                        relative_path = img_path.split('data/products/')[-1]
-                    product_copy['image_url'] = f'/images/products/{relative_path}'
-                elif 'data\\preprocessed\\' in img_path or 'data/preprocessed/' in img_path:
-                    relative_path = img_path.split('data\\preprocessed\\')[-1].replace('\\', '/')
-                    if 'data/preprocessed/' in img_path:
-                        relative_path = img_path.split('data/preprocessed/')[-1]
-                    product_copy['image_url'] = f'/images/preprocessed/{relative_path}'
-                
-                results.append(product_copy)
-        
-        # Limiter à 20 résultats
-        results = results[:20]
+        limit = min(max(int(request.args.get('limit', 20)), 1), Config.TEXT_SEARCH_MAX_LIMIT)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    prefix = request.args.get('prefix', '1') != '0'
+    
+    try:
+        state = search_state.current
+        docs, scores, total = state.text_index.search(query, limit=limit, offset=offset, prefix=prefix)
+        results = [state.catalog_products[doc] for doc in docs.tolist()]
         
         return jsonify({
             'success': True,
             'count': len(results),
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'has_more': offset + len(results) < total,
             'query': query,
             'results': results
         })
@@ -281,8 +846,7 @@ def get_categories():
     """
     Retourner toutes les catégories disponibles
     """
-    categories = list(set([p['category'] for p in products_metadata['products']]))
-    categories.sort()
+    categories = search_state.current.categories
     
     return jsonify({
         'success': True,
@@ -291,6 +855,96 @@ def get_categories():
     })
 
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Métriques du service (micro-batching, version de l'index, cache des vecteurs de requête)
+    """
+    return jsonify({
+        'success': True,
+        'micro_batching': micro_batcher.metrics.snapshot() if micro_batcher is not None else None,
+        'startup': startup_timer.snapshot(),
+        'model': model_status(),
+        'index': search_state.status(),
+        'embedding_cache': embedding_cache.stats() if embedding_cache is not None else None
+    })
+
+def model_status():
+    """
+    État du modèle : 'ready', 'loading', 'failed' ou 'not_loaded' (mode 'lazy', aucune recherche par image)
+    
+    Returns:
+        dict: État, dernière erreur et durée de chaque étape du chargement (ms)
+    """
+    if feature_extractor is not None:
+        status = 'ready'
+    elif model_lock.locked():
+        status = 'loading'
+    elif model_error is not None:
+        status = 'failed'
+    else:
+        status = 'not_loaded'
+    return {'status': status, 'error': model_error, 'profile_ms': model_profile}
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Vivacité : le processus répond (indépendant de l'index et du modèle)
+    """
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Disponibilité : index chargé et modèle prêt (sauf en mode 'lazy', où le modèle
+    est chargé par la première recherche par image). 503 tant que le worker
+    ne doit pas recevoir de trafic.
+    """
+    model = model_status()
+    is_ready = search_state.current is not None and (model['status'] == 'ready' or Config.MODEL_LOADING == 'lazy')
+    
+    return jsonify({
+        'ready': is_ready,
+        'index': search_state.current.version if search_state.current is not None else None,
+        'model': model,
+        'startup': startup_timer.snapshot()
+    }), 200 if is_ready else 503
+
+def is_admin_request():
+    """
+    Requête d'administration autorisée : jeton Config.ADMIN_TOKEN (en-tête X-Admin-Token).
+    L'adresse d'origine n'est pas utilisée : derrière un reverse proxy sur la
+    même machine, toutes les requêtes viennent de 127.0.0.1
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(Config.ADMIN_TOKEN) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_index():
+    """
+    Recharger l'index à chaud (nouvelle version construite sur disque).
+    Le chargement se fait en arrière-plan ; les requêtes en cours terminent
+    sur l'ancienne version. Query params: wait (1 = attendre la fin du chargement)
+    Route désactivée sans Config.ADMIN_TOKEN
+    """
+    if not Config.ADMIN_TOKEN:
+        return jsonify({'error': 'Admin routes disabled (ADMIN_TOKEN not set)'}), 404
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    wait = request.args.get('wait', '0') == '1'
+    started = search_state.reload(wait=wait)
+    
+    if not started:
+        return jsonify({'success': False, 'error': 'Reload already in progress', 'index': search_state.status()}), 409
+    
+    status = search_state.status()
+    if wait and status['last_error']:
+        return jsonify({'success': False, 'error': status['last_error'], 'index': status}), 500
+    
+    return jsonify({'success': True, 'index': status}), 200 if wait else 202
+
+
 
 
 
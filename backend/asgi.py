@@ -0,0 +1,129 @@
+"""
+Mode de service asynchrone (ASGI) de l'API
+
+La recherche par image (/api/search/image) est servie par une route asynchrone :
+l'upload est lu sans bloquer la boucle d'événements, puis l'extraction des
+features, la recherche et l'encodage JSON s'exécutent dans un pool de threads
+borné. Au-delà de Config.ASYNC_QUEUE_LIMIT recherches en cours, la requête est
+refusée immédiatement (503 + Retry-After) au lieu d'allonger la file d'attente.
+
+Toutes les autres routes sont celles de l'application Flask (app.py), montées
+telles quelles : même index, même modèle, même contrat pour le frontend.
+
+Lancement : uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import app as flask_api
+from config import Config
+
+# Pool borné : au plus ASYNC_INFERENCE_WORKERS recherches exécutées en parallèle
+# (les extractions concurrentes sont regroupées par le micro-batcher)
+inference_executor = ThreadPoolExecutor(
+    max_workers=Config.ASYNC_INFERENCE_WORKERS,
+    thread_name_prefix='inference'
+)
+
+# Recherches acceptées et pas encore terminées (modifié uniquement dans la boucle d'événements)
+in_flight = 0
+
+def release_slot():
+    global in_flight
+    in_flight -= 1
+
+def json_response(payload, status_code=200, headers=None):
+    """
+    Réponse JSON (corps déjà encodé ou dictionnaire), avec l'en-tête CORS
+    qu'ajoute flask_cors aux routes Flask
+    """
+    body = payload if isinstance(payload, str) else json.dumps(payload)
+    return Response(
+        body, status_code=status_code, media_type='application/json',
+        headers={'Access-Control-Allow-Origin': '*', **(headers or {})}
+    )
+
+def run_search(data, filename, top_k, filters):
+    """
+    Recherche et encodage JSON, exécutés dans inference_executor
+
+    Returns:
+        tuple: (corps JSON encodé, code HTTP)
+    """
+    payload, status = flask_api.search_image(data, filename, top_k, filters)
+    return json.dumps(payload), status
+
+async def search_by_image(request):
+    """
+    Rechercher des produits similaires à partir d'une image (même contrat que la route Flask)
+    Query params: top_k, category, min_price, max_price, in_stock (voir parse_search_filters)
+    """
+    global in_flight
+
+    # Refuser avant de lire l'upload : la surcharge ne coûte pas de mémoire
+    if in_flight >= Config.ASYNC_QUEUE_LIMIT:
+        return json_response({'error': 'Server overloaded, retry later'}, 503, headers={'Retry-After': '1'})
+
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > Config.MAX_CONTENT_LENGTH:
+        return json_response({'error': 'File too large'}, 413)
+
+    in_flight += 1
+    submitted = False
+    try:
+        async with request.form(max_part_size=Config.MAX_CONTENT_LENGTH) as form:
+            file = form.get('image')
+
+            if file is None or isinstance(file, str):
+                return json_response({'error': 'No image provided'}, 400)
+
+            if file.filename == '':
+                return json_response({'error': 'No selected file'}, 400)
+
+            try:
+                filters = flask_api.parse_search_filters(request.query_params)
+            except ValueError as e:
+                return json_response({'error': f'Invalid filter: {e}'}, 400)
+
+            if not flask_api.allowed_file(file.filename):
+                return json_response({'error': 'Invalid file type'}, 400)
+
+            try:
+                top_k = int(request.query_params.get('top_k', 10))
+                data = await file.read()
+
+                loop = asyncio.get_running_loop()
+                future = inference_executor.submit(run_search, data, file.filename, top_k, filters)
+                submitted = True
+                # Le créneau est libéré à la fin du travail et non de la requête : un client
+                # déconnecté n'annule pas une recherche déjà en cours dans le pool
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(release_slot))
+                body, status = await asyncio.wrap_future(future)
+                return json_response(body, status)
+
+            except Exception as e:
+                return json_response({'error': str(e)}, 500)
+    finally:
+        if not submitted:
+            release_slot()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    inference_executor.shutdown(wait=False)
+
+app = Starlette(
+    routes=[
+        Route('/api/search/image', search_by_image, methods=['POST']),
+        # Autres routes : application Flask (exécutée dans le pool de threads de a2wsgi)
+        Mount('/', app=WSGIMiddleware(flask_api.app))
+    ],
+    lifespan=lifespan
+)
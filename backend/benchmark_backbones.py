@@ -0,0 +1,127 @@
+import argparse
+import os
+import time
+import numpy as np
+
+from models.backbones import BACKBONES
+from models.batching import latency_summary
+from models.feature_extractor import FeatureExtractor, load_image_array
+from build_features_database import load_build_metadata
+
+
+def sample_catalog(n_images, seed=0):
+    """
+    Échantillonner des images du catalogue (avec leur catégorie)
+
+    Returns:
+        tuple: (chemins des images, catégories)
+    """
+    products = [product for product in load_build_metadata()['products']
+                if os.path.exists(product['image_path'])]
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(products), min(n_images, len(products)), replace=False))
+    return [products[row]['image_path'] for row in rows], [products[row].get('category') for row in rows]
+
+
+def nearest_neighbours(features, top_k):
+    """
+    Les `top_k` plus proches voisins de chaque image parmi l'échantillon (elle-même exclue)
+    """
+    similarities = features @ features.T
+    np.fill_diagonal(similarities, -np.inf)
+    top_k = min(top_k, len(features) - 1)
+    candidates = np.argpartition(-similarities, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(similarities, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def category_precision(neighbours, categories):
+    """
+    Précision@k : part des voisins de la même catégorie que l'image requête
+    """
+    categories = np.asarray(categories, dtype=object)
+    return float((categories[neighbours] == categories[:, np.newaxis]).mean())
+
+
+def neighbours_overlap(neighbours, reference):
+    """
+    Rappel@k par rapport au modèle de référence : part de ses voisins retrouvés
+    """
+    return float(np.mean([len(set(a).intersection(b)) / len(b) for a, b in zip(neighbours, reference)]))
+
+
+def benchmark_backbone(model_name, img_paths, batch_size, n_latency):
+    """
+    Mesurer un modèle : latence d'une image, débit par lots et vecteurs de l'échantillon
+
+    Returns:
+        tuple: (résumé de latence (ms), images/s, matrice de features, temps de chargement (s))
+    """
+    start = time.perf_counter()
+    extractor = FeatureExtractor(model_name)
+    extractor.warmup(batch_sizes=(1, batch_size))
+    load_s = time.perf_counter() - start
+
+    # Latence d'une requête (image déjà décodée : seul le modèle est mesuré).
+    # extract_features_from_array prétraite une copie : chaque appel voit la même image
+    img_array = load_image_array(img_paths[0])
+    durations = []
+    for _ in range(n_latency):
+        start = time.perf_counter()
+        extractor.extract_features_from_array(img_array)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    # Débit de la construction (décodage compris)
+    start = time.perf_counter()
+    features, failed = extractor.extract_features_batch(img_paths, batch_size=batch_size)
+    throughput = (len(img_paths) - len(failed)) / (time.perf_counter() - start)
+
+    return latency_summary(durations), throughput, features, load_s
+
+
+def benchmark_backbones(model_names, n_images=500, batch_size=32, top_k=10, n_latency=50):
+    """
+    Comparer les modèles du registre : latence, débit et qualité de la recherche
+    """
+    print("=" * 70)
+    print("⏱️  BENCHMARK DES MODÈLES")
+    print("=" * 70)
+
+    img_paths, categories = sample_catalog(n_images)
+    print(f"   Images : {len(img_paths)} | Batch : {batch_size} | top_k : {top_k}\n")
+
+    rows = []
+    reference = None
+    for model_name in model_names:
+        latency, throughput, features, load_s = benchmark_backbone(model_name, img_paths, batch_size, n_latency)
+        neighbours = nearest_neighbours(features, top_k)
+        if reference is None:
+            reference = neighbours  # Premier modèle de la liste = référence
+        rows.append((
+            model_name, BACKBONES[model_name].output_dim, load_s, latency['p50'], latency['p95'], throughput,
+            category_precision(neighbours, categories), neighbours_overlap(neighbours, reference)
+        ))
+
+    print(f"\n   {'Modèle':>16} | {'Dim':>4} | {'Chargement (s)':>14} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | "
+          f"{'Images/s':>8} | {'Précision@k':>11} | {'Rappel@k réf.':>13}")
+    print("   " + "-" * 104)
+    for model_name, dim, load_s, p50, p95, throughput, precision, overlap in rows:
+        print(f"   {model_name:>16} | {dim:>4} | {load_s:>14.1f} | {p50:>8.2f} | {p95:>8.2f} | "
+              f"{throughput:>8.1f} | {precision:>11.3f} | {overlap:>13.3f}")
+    print(f"\n   Précision@k : voisins de la même catégorie | Rappel@k réf. : voisins communs avec {model_names[0]}")
+    print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark des modèles du registre (models/backbones.py)")
+    parser.add_argument('--models', nargs='+', default=list(BACKBONES), choices=list(BACKBONES))
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--latency-runs', type=int, default=50)
+    args = parser.parse_args()
+
+    benchmark_backbones(
+        args.models, n_images=args.images, batch_size=args.batch_size,
+        top_k=args.top_k, n_latency=args.latency_runs
+    )
@@ -0,0 +1,66 @@
+import argparse
+import time
+import numpy as np
+
+from config import Config
+from models.feature_extractor import FeatureExtractor
+
+
+def time_inference(extractor, batch_size, repeat=20):
+    """
+    Latence (ms) d'un appel au modèle pour un batch donné (médiane de `repeat` appels)
+    """
+    batch = np.random.default_rng(0).uniform(
+        0, 255, (batch_size,) + tuple(Config.IMAGE_SIZE) + (3,)
+    ).astype(np.float32)
+
+    # Premier appel exclu (compilation, allocation)
+    extractor.extract_features_from_array(batch)
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extractor.extract_features_from_array(batch)
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations)) * 1000
+
+
+def benchmark_inference(backends, batch_sizes=(1, 8, 32), repeat=20):
+    """
+    Comparer la latence par image des différents chemins d'inférence
+    """
+    print("=" * 70)
+    print("⏱️  BENCHMARK DE L'INFÉRENCE")
+    print("=" * 70)
+
+    rows = []
+    reference = None
+    for backend in backends:
+        extractor = FeatureExtractor(Config.MODEL_NAME, backend=backend)
+
+        # Vérifier que le backend produit les mêmes vecteurs que predict()
+        sample = np.random.default_rng(1).uniform(0, 255, (2,) + tuple(Config.IMAGE_SIZE) + (3,)).astype(np.float32)
+        features = extractor.extract_features_from_array(sample)
+        if reference is None:
+            reference = features
+        max_diff = float(np.abs(features - reference).max())
+
+        for batch_size in batch_sizes:
+            latency_ms = time_inference(extractor, batch_size, repeat)
+            rows.append((backend, batch_size, latency_ms, latency_ms / batch_size, max_diff))
+
+    print(f"\n   {'Backend':>12} | {'Batch':>5} | {'Appel (ms)':>10} | {'Par image (ms)':>14} | {'Écart max':>9}")
+    print("   " + "-" * 63)
+    for backend, batch_size, latency_ms, per_image_ms, max_diff in rows:
+        print(f"   {backend:>12} | {batch_size:>5} | {latency_ms:>10.2f} | {per_image_ms:>14.2f} | {max_diff:>9.2e}")
+    print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark des chemins d'inférence du FeatureExtractor")
+    parser.add_argument('--backends', nargs='+', default=['predict', 'tf_function', 'tflite'])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    benchmark_inference(args.backends, batch_sizes=args.batch_sizes, repeat=args.repeat)
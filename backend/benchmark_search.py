@@ -0,0 +1,182 @@
+import argparse
+import time
+import numpy as np
+
+from utils.similarity_search import SimilaritySearch
+from utils.ann_index import IVFIndex, recall_at_k
+from utils.quantization import ScalarQuantizer, ProductQuantizer
+
+
+def legacy_find_similar(features_matrix, query_features, top_k):
+    """
+    Ancienne implémentation (normes recalculées + argsort complet à chaque requête)
+    """
+    similarities = np.dot(features_matrix, query_features) / (
+        np.linalg.norm(features_matrix, axis=1) * np.linalg.norm(query_features)
+    )
+    return np.argsort(similarities)[::-1][:top_k]
+
+
+def random_features(n_rows, dim, seed=0):
+    """
+    Générer une matrice de features aléatoires normalisées (norme L2)
+    """
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((n_rows, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def clustered_features(n_rows, dim, n_clusters=200, noise=0.5, seed=0):
+    """
+    Générer des features regroupées en clusters (plus proche d'un vrai catalogue)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    matrix = centers[rng.integers(0, n_clusters, n_rows)]
+    matrix += noise * rng.standard_normal((n_rows, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def time_per_query(fn, queries, repeat=3):
+    """
+    Latence moyenne (ms) par requête, meilleure de `repeat` passes
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            fn(query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1000
+
+
+def benchmark_search(sizes, dim=2048, n_queries=20, top_k=10):
+    """
+    Comparer la latence de recherche en fonction de la taille du catalogue
+    """
+    print("=" * 70)
+    print("⏱️  BENCHMARK DE LA RECHERCHE DE SIMILARITÉ")
+    print("=" * 70)
+    print(f"   Dimension : {dim} | Requêtes : {n_queries} | top_k : {top_k}\n")
+    print(f"   {'Catalogue':>10} | {'Ancienne (ms)':>13} | {'Nouvelle (ms)':>13} | {'Gain':>6}")
+    print("   " + "-" * 52)
+
+    for n_rows in sizes:
+        features_matrix = random_features(n_rows, dim)
+        queries = random_features(n_queries, dim, seed=1)
+        image_paths = [f"image_{i}.jpg" for i in range(n_rows)]
+
+        search_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+
+        legacy_ms = time_per_query(lambda q: legacy_find_similar(features_matrix, q, top_k), queries)
+        new_ms = time_per_query(lambda q: search_engine.find_similar(q, top_k), queries)
+
+        print(f"   {n_rows:>10} | {legacy_ms:>13.3f} | {new_ms:>13.3f} | {legacy_ms / new_ms:>5.1f}x")
+
+    print("=" * 70 + "\n")
+
+
+def benchmark_ivf(features_matrix, n_queries=200, top_k=10, n_lists=None, nprobes=(1, 2, 4, 8, 16, 32)):
+    """
+    Rappel@k et latence de l'index IVF en fonction de nprobe
+    """
+    n_rows = features_matrix.shape[0]
+    n_lists = n_lists or IVFIndex.default_n_lists(n_rows)
+    image_paths = [f"image_{i}.jpg" for i in range(n_rows)]
+
+    print("=" * 70)
+    print("🗂️  BENCHMARK DE L'INDEX IVF")
+    print("=" * 70)
+    print(f"   Catalogue : {n_rows} x {features_matrix.shape[1]} | Listes : {n_lists} | top_k : {top_k}\n")
+
+    start = time.perf_counter()
+    index = IVFIndex(n_lists=n_lists).build(features_matrix)
+    print(f"   ⏱️  Construction : {time.perf_counter() - start:.2f} s\n")
+
+    # Requêtes : produits du catalogue légèrement bruités
+    rng = np.random.default_rng(1)
+    queries = features_matrix[rng.choice(n_rows, n_queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+    ivf_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine', index=index)
+
+    exact_results = [exact_engine.find_similar(q, top_k) for q in queries]
+    exact_ms = time_per_query(lambda q: exact_engine.find_similar(q, top_k), queries)
+
+    print(f"   {'nprobe':>8} | {'Rappel@' + str(top_k):>10} | {'Latence (ms)':>12} | {'Gain':>6}")
+    print("   " + "-" * 47)
+    print(f"   {'exact':>8} | {1.0:>10.3f} | {exact_ms:>12.3f} | {1.0:>5.1f}x")
+
+    for nprobe in nprobes:
+        if nprobe > n_lists:
+            continue
+        approx_results = [ivf_engine.find_similar(q, top_k, nprobe=nprobe) for q in queries]
+        recall = recall_at_k(exact_results, approx_results)
+        ivf_ms = time_per_query(lambda q: ivf_engine.find_similar(q, top_k, nprobe=nprobe), queries)
+        print(f"   {nprobe:>8} | {recall:>10.3f} | {ivf_ms:>12.3f} | {exact_ms / ivf_ms:>5.1f}x")
+
+    print("=" * 70 + "\n")
+
+
+def benchmark_compression(features_matrix, n_queries=200, top_k=10, pq_m=256, rerank_factor=10):
+    """
+    Mémoire, rappel@k et latence des stockages compressés (int8, PQ)
+    """
+    n_rows = features_matrix.shape[0]
+    image_paths = [f"image_{i}.jpg" for i in range(n_rows)]
+
+    print("=" * 70)
+    print("🗜️  BENCHMARK DU STOCKAGE COMPRESSÉ")
+    print("=" * 70)
+    print(f"   Catalogue : {n_rows} x {features_matrix.shape[1]} | top_k : {top_k}\n")
+
+    rng = np.random.default_rng(1)
+    queries = features_matrix[rng.choice(n_rows, n_queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+    exact_results = [exact_engine.find_similar(q, top_k) for q in queries]
+    exact_ms = time_per_query(lambda q: exact_engine.find_similar(q, top_k), queries)
+
+    print(f"   {'Stockage':>10} | {'Short-list':>10} | {'Mémoire (MB)':>12} | {'Rappel@' + str(top_k):>10} | {'Latence (ms)':>12}")
+    print("   " + "-" * 66)
+    print(f"   {'float32':>10} | {'-':>10} | {features_matrix.nbytes / (1024*1024):>12.2f} | {1.0:>10.3f} | {exact_ms:>12.3f}")
+
+    for store in (ScalarQuantizer().build(features_matrix), ProductQuantizer(m=pq_m).build(features_matrix)):
+        for factor in sorted({1, rerank_factor}):
+            engine = SimilaritySearch(features_matrix, image_paths, metric='cosine', store=store, rerank_factor=factor)
+            recall = recall_at_k(exact_results, [engine.find_similar(q, top_k) for q in queries])
+            latency_ms = time_per_query(lambda q: engine.find_similar(q, top_k), queries)
+            print(f"   {store.kind:>10} | {top_k * factor:>10} | {store.nbytes / (1024*1024):>12.2f} | "
+                  f"{recall:>10.3f} | {latency_ms:>12.3f}")
+
+    print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche de similarité")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000, 100000])
+    parser.add_argument('--dim', type=int, default=2048)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--ivf', action='store_true', help="Rapport rappel@k / latence de l'index IVF")
+    parser.add_argument('--compression', action='store_true', help="Rapport mémoire / rappel@k int8 et PQ")
+    parser.add_argument('--pq-m', type=int, default=256)
+    parser.add_argument('--features', help="Matrice .npy réelle à utiliser (défaut : données synthétiques)")
+    args = parser.parse_args()
+
+    if args.ivf or args.compression:
+        if args.features:
+            matrix = np.load(args.features).astype(np.float32)
+        else:
+            matrix = clustered_features(max(args.sizes), args.dim)
+
+        if args.ivf:
+            benchmark_ivf(matrix, n_queries=max(args.queries, 100), top_k=args.top_k)
+        if args.compression:
+            benchmark_compression(matrix, n_queries=max(args.queries, 100), top_k=args.top_k, pq_m=args.pq_m)
+    else:
+        benchmark_search(args.sizes, dim=args.dim, n_queries=args.queries, top_k=args.top_k)
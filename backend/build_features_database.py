@@ -4,22 +4,248 @@ import numpy as np
 from pathlib import Path
 from tqdm import tqdm
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from config import Config
-from models.feature_extractor import FeatureExtractor
+from models.feature_extractor import FeatureExtractor, decode_image_bytes
 # Mise à jour de l'importation pour éviter les boucles
 from utils.similarity_search import SimilaritySearch
+from utils.ann_index import IVFIndex, recall_at_k
+from utils.quantization import ScalarQuantizer, ProductQuantizer
+from utils.projection import PCAProjection
+from utils.catalog import ProductCatalog
+from utils.manifest import sha1_of_bytes, file_signature, atomic_write, save_manifest
 
-def build_feature_database():
+def sample_queries(features_matrix, n_queries):
     """
-    Construire la base de features pour TOUS les produits
-    Utilise automatiquement les images prétraitées si disponibles
+    Produits du catalogue utilisés comme requêtes pour mesurer le rappel@k
     """
-    print("=" * 70)
-    print("🚀 CONSTRUCTION DE LA BASE DE FEATURES")
-    print("=" * 70)
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(features_matrix.shape[0], min(n_queries, features_matrix.shape[0]), replace=False)
+    return features_matrix[query_rows]
+
+def build_ivf_index(features_matrix, image_paths, n_queries=200, top_k=10):
+    """
+    Construire l'index IVF, le sauvegarder et afficher le rappel@k
+    par rapport à la recherche exacte pour plusieurs valeurs de nprobe
+    
+    Args:
+        features_matrix (numpy.ndarray): Matrice de features
+        image_paths (list): Chemins des images (alignés avec la matrice)
+        n_queries (int): Nombre de produits du catalogue utilisés comme requêtes
+        top_k (int): k du rappel@k
+        
+    Returns:
+        IVFIndex: Index construit
+    """
+    n_lists = Config.IVF_N_LISTS or IVFIndex.default_n_lists(features_matrix.shape[0])
+    print(f"\n🗂️  Construction de l'index IVF ({n_lists} listes)...")
+    
+    index = IVFIndex(n_lists=n_lists, nprobe=Config.IVF_NPROBE).build(features_matrix)
+    index.save(Config.IVF_INDEX_FILE)
+    print(f"   ✅ Index IVF sauvegardé : {Config.IVF_INDEX_FILE}")
+    
+    # Rapport rappel@k vs nprobe
+    queries = sample_queries(features_matrix, n_queries)
+    
+    exact_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+    ivf_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine', index=index)
+    exact_results = exact_engine.find_similar_batch(queries, top_k)
+    
+    print(f"\n   📈 Rappel@{top_k} par rapport à la recherche exacte :")
+    for nprobe in sorted({1, 2, 4, 8, 16, 32, Config.IVF_NPROBE}):
+        if nprobe > index.n_lists:
+            continue
+        approx_results = [ivf_engine.find_similar(q, top_k, nprobe=nprobe) for q in queries]
+        marker = ' ←' if nprobe == Config.IVF_NPROBE else ''
+        print(f"      • nprobe={nprobe:<3} : {recall_at_k(exact_results, approx_results):.3f}{marker}")
+    
+    return index
+
+def build_projection(features_matrix, image_paths, n_queries=200, top_k=10):
+    """
+    Estimer la projection PCA (Config.PCA_DIM), la sauvegarder et afficher le
+    rappel@k de la recherche exacte en dimension réduite par rapport à la
+    recherche exacte sur les vecteurs complets, pour plusieurs dimensions
+    
+    Args:
+        features_matrix (numpy.ndarray): Matrice de features complète
+        image_paths (list): Chemins des images (alignés avec la matrice)
+        n_queries (int): Nombre de produits du catalogue utilisés comme requêtes
+        top_k (int): k du rappel@k
+        
+    Returns:
+        PCAProjection: Projection sur Config.PCA_DIM dimensions
+    """
+    input_dim = features_matrix.shape[1]
+    print(f"\n📐 Projection PCA {input_dim} -> {Config.PCA_DIM}{' (blanchie)' if Config.PCA_WHITEN else ''}...")
+    
+    # Une seule décomposition : les dimensions du rapport sont des troncatures
+    dims = sorted({dim for dim in Config.PCA_REPORT_DIMS if dim < input_dim} | {Config.PCA_DIM})
+    full = PCAProjection(dim=dims[-1], whiten=Config.PCA_WHITEN).fit(
+        features_matrix, sample_size=Config.PCA_SAMPLE_SIZE
+    )
+    projection = full.truncate(Config.PCA_DIM)
+    os.makedirs(Config.FEATURES_DIR, exist_ok=True)
+    atomic_write(Config.PROJECTION_FILE, projection.save)
+    print(f"   ✅ Projection sauvegardée : {Config.PROJECTION_FILE}")
+    
+    # Rapport rappel@k vs dimension
+    queries = sample_queries(features_matrix, n_queries)
+    exact_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+    exact_results = exact_engine.find_similar_batch(queries, top_k)
+    
+    print(f"\n   📈 Rappel@{top_k} par rapport aux vecteurs complets ({input_dim} dimensions, "
+          f"{features_matrix.nbytes / (1024*1024):.1f} MB) :")
+    for dim in dims:
+        reduced = full.truncate(dim)
+        engine = SimilaritySearch(reduced.transform(features_matrix), image_paths, metric='cosine')
+        recall = recall_at_k(exact_results, engine.find_similar_batch(reduced.transform(queries), top_k))
+        marker = ' ←' if dim == Config.PCA_DIM else ''
+        print(f"      • dim={dim:<5} : {recall:.3f} (variance {reduced.explained_variance_ratio.sum():.1%}, "
+              f"{engine.features_matrix.nbytes / (1024*1024):.1f} MB){marker}")
+    
+    return projection
+
+def build_compressed_store(features_matrix, image_paths, n_queries=200, top_k=10):
+    """
+    Construire le stockage compressé (int8 ou PQ) selon Config.FEATURES_STORAGE,
+    le sauvegarder et afficher le gain mémoire et le rappel@k avec / sans re-classement
     
-    # 1. Vérifier si les images prétraitées existent
+    Returns:
+        ScalarQuantizer | ProductQuantizer: Stockage construit
+    """
+    if Config.FEATURES_STORAGE == 'int8':
+        print("\n🗜️  Quantification scalaire int8...")
+        store = ScalarQuantizer().build(features_matrix)
+        store_file = Config.INT8_STORE_FILE
+    else:
+        print(f"\n🗜️  Quantification produit (PQ, m={Config.PQ_M})...")
+        store = ProductQuantizer(m=Config.PQ_M).build(features_matrix)
+        store_file = Config.PQ_STORE_FILE
+    
+    store.save(store_file)
+    print(f"   ✅ Stockage compressé sauvegardé : {store_file}")
+    print(f"   📉 Mémoire : {features_matrix.nbytes / (1024*1024):.2f} MB -> "
+          f"{store.nbytes / (1024*1024):.2f} MB ({features_matrix.nbytes / store.nbytes:.1f}x)")
+    
+    # Rapport rappel@k : codes seuls vs re-classement float32 de la short-list
+    queries = sample_queries(features_matrix, n_queries)
+    exact_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine')
+    exact_results = exact_engine.find_similar_batch(queries, top_k)
+    
+    print(f"\n   📈 Rappel@{top_k} par rapport à la recherche exacte :")
+    for rerank_factor in sorted({1, Config.RERANK_FACTOR}):
+        engine = SimilaritySearch(features_matrix, image_paths, metric='cosine',
+                                  store=store, rerank_factor=rerank_factor)
+        recall = recall_at_k(exact_results, engine.find_similar_batch(queries, top_k))
+        print(f"      • short-list {top_k * rerank_factor:<5} : {recall:.3f}")
+    
+    return store
+
+def extract_features_pipeline(extractor, img_paths, batch_size=None, workers=None, prefetch=None):
+    """
+    Extraire les features en flux : un pool de threads décode et redimensionne
+    les images des lots suivants pendant que le modèle traite le lot courant,
+    et les vecteurs sont écrits directement dans une matrice préallouée
+    
+    Args:
+        extractor (FeatureExtractor): Extracteur de features
+        img_paths (list): Chemins des images
+        batch_size (int): Images par passage du modèle (défaut : Config.BUILD_BATCH_SIZE)
+        workers (int): Threads de décodage (défaut : Config.BUILD_DECODE_WORKERS)
+        prefetch (int): Lots décodés à l'avance (défaut : Config.BUILD_PREFETCH_BATCHES)
+        
+    Returns:
+        tuple: (matrice float32 des images valides, masque booléen des images valides,
+                empreinte sha1 de chaque image)
+    """
+    batch_size = batch_size or Config.BUILD_BATCH_SIZE
+    workers = workers or Config.BUILD_DECODE_WORKERS
+    prefetch = prefetch or Config.BUILD_PREFETCH_BATCHES
+    
+    n_images = len(img_paths)
+    features_matrix = np.empty((n_images, extractor.output_dim), dtype=np.float32)
+    valid = np.zeros(n_images, dtype=bool)
+    
+    hashes = [None] * n_images
+    
+    def decode(row):
+        start = time.perf_counter()
+        img_path = img_paths[row]
+        try:
+            # Lecture unique du fichier : empreinte (mises à jour incrémentales) + décodage
+            with open(img_path, 'rb') as f:
+                data = f.read()
+            hashes[row] = sha1_of_bytes(data)
+            img_array = decode_image_bytes(data)
+        except Exception as e:
+            print(f"\n⚠️  Erreur sur {img_path}: {e}")
+            img_array = None
+        return img_array, time.perf_counter() - start
+    
+    decode_seconds = 0.0  # Temps cumulé des threads de décodage
+    wait_seconds = 0.0    # Temps passé par le modèle à attendre le décodage
+    model_seconds = 0.0
+    started_at = time.perf_counter()
+    
+    batch_starts = list(range(0, n_images, batch_size))
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=n_images, desc="Extraction", unit="image") as progress:
+        
+        def submit(batch_start):
+            return [executor.submit(decode, row) for row in range(batch_start, min(batch_start + batch_size, n_images))]
+        
+        # Lots en cours de décodage (mémoire bornée à `prefetch` lots)
+        pending = deque(submit(start) for start in batch_starts[:prefetch])
+        
+        for i, batch_start in enumerate(batch_starts):
+            futures = pending.popleft()
+            if i + prefetch < len(batch_starts):
+                pending.append(submit(batch_starts[i + prefetch]))
+            
+            wait_start = time.perf_counter()
+            decoded = [future.result() for future in futures]
+            wait_seconds += time.perf_counter() - wait_start
+            decode_seconds += sum(duration for _, duration in decoded)
+            
+            rows = [batch_start + j for j, (img_array, _) in enumerate(decoded) if img_array is not None]
+            if rows:
+                model_start = time.perf_counter()
+                batch = np.stack([img_array for img_array, _ in decoded if img_array is not None])
+                features_matrix[rows] = extractor.extract_features_from_array(batch)
+                model_seconds += time.perf_counter() - model_start
+                valid[rows] = True
+            
+            progress.update(len(futures))
+    
+    total_seconds = time.perf_counter() - started_at
+    
+    print(f"\n📈 Débit par étape ({n_images} images, lots de {batch_size}, {workers} threads de décodage) :")
+    print(f"   • Décodage : {n_images / max(decode_seconds, 1e-9):.1f} images/s par thread "
+          f"(~{n_images * workers / max(decode_seconds, 1e-9):.1f} images/s avec {workers} threads)")
+    print(f"   • Modèle   : {n_images / max(model_seconds, 1e-9):.1f} images/s")
+    print(f"   • Attente du décodage par le modèle : {wait_seconds:.1f} s")
+    print(f"   • Global   : {n_images / max(total_seconds, 1e-9):.1f} images/s ({total_seconds:.1f} s)")
+    
+    # Compacter : ne garder que les lignes des images valides (ordre conservé)
+    if not valid.all():
+        features_matrix = features_matrix[valid]
+    
+    return features_matrix, valid, hashes
+
+def load_build_metadata():
+    """
+    Charger les métadonnées à indexer : images prétraitées si elles existent,
+    sinon images originales
+    
+    Returns:
+        dict: Métadonnées {'products', 'categories', 'total_products'}
+    """
+    # Vérifier si les images prétraitées existent
     preprocessed_metadata_file = os.path.join(Config.DATA_DIR, 'metadata_preprocessed.json')
     
     print("\n📂 Chargement des métadonnées...")
@@ -40,102 +266,149 @@ def build_feature_database():
         print("   ℹ️  Utilisation des images ORIGINALES")
         print(f"      Dossier : data/products/")
     
-    print(f"\n   📊 {metadata['total_products']} produits à traiter")
-    
-    # 2. Initialiser l'extracteur de features
-    print("\n🤖 Initialisation du modèle ResNet50...")
-    extractor = FeatureExtractor(Config.MODEL_NAME)
-    
-    # 3. Extraire les features de toutes les images
-    print("\n⚙️  Extraction des features en cours...")
-    print("   (Cela peut prendre 5-15 minutes selon votre machine)\n")
-    
-    features_dict = {}  # {image_path: features}
-    features_list = []
-    image_paths = []
-    valid_products = []
-    
-    # Barre de progression
-    for product in tqdm(metadata['products'], desc="Extraction", unit="image"):
-        img_path = product['image_path']
-        
-        # Vérifier que l'image existe
-        if not os.path.exists(img_path):
-            print(f"\n⚠️  Image non trouvée : {img_path}")
-            continue
-        
-        # Extraire les features
-        features = extractor.extract_features(img_path)
-        
-        if features is not None:
-            features_dict[img_path] = features
-            features_list.append(features)
-            image_paths.append(img_path)
-            valid_products.append(product)
-        else:
-            print(f"\n❌ Échec extraction : {img_path}")
-    
-    # 4. Convertir en matrice numpy
-    print(f"\n\n📊 Conversion en matrice numpy...")
-    features_matrix = np.array(features_list).astype('float32')
-    
-    print(f"   ✅ Matrice créée : {features_matrix.shape}")
-    print(f"      • Nombre d'images : {features_matrix.shape[0]}")
-    print(f"      • Dimension des features : {features_matrix.shape[1]}")
+    return metadata
+
+def save_feature_files(features_matrix, image_paths, table_products, categories):
+    """
+    Sauvegarder la matrice, les chemins, la table des produits, le dictionnaire
+    de features et les métadonnées valides (écritures atomiques)
     
-    # 5. Créer le dossier features s'il n'existe pas
+    Args:
+        features_matrix (numpy.ndarray): Matrice de features
+        image_paths (list): Chemins alignés sur les lignes
+        table_products (list): Produit de chaque ligne (None = ligne supprimée)
+        categories (list): Catégories du catalogue
+    """
     os.makedirs(Config.FEATURES_DIR, exist_ok=True)
     
-    # 6. Sauvegarder les données
-    print(f"\n💾 Sauvegarde des données...")
+    valid_rows = [row for row, product in enumerate(table_products) if product is not None]
+    valid_products = [table_products[row] for row in valid_rows]
     
     # Sauvegarder le dictionnaire
-    with open(Config.FEATURES_DB_FILE, 'wb') as f:
-        pickle.dump(features_dict, f)
+    features_dict = {image_paths[row]: features_matrix[row] for row in valid_rows}  # {image_path: features}
+    atomic_write(Config.FEATURES_DB_FILE, lambda f: pickle.dump(features_dict, f))
     print(f"   ✅ Dictionnaire sauvegardé : {Config.FEATURES_DB_FILE}")
     
     # Sauvegarder la matrice
-    np.save(Config.FEATURES_MATRIX_FILE, features_matrix)
+    atomic_write(Config.FEATURES_MATRIX_FILE, lambda f: np.save(f, features_matrix))
     print(f"   ✅ Matrice sauvegardée : {Config.FEATURES_MATRIX_FILE}")
     
     # Sauvegarder les chemins d'images
-    with open(Config.IMAGE_PATHS_FILE, 'wb') as f:
-        pickle.dump(image_paths, f)
+    atomic_write(Config.IMAGE_PATHS_FILE, lambda f: pickle.dump(image_paths, f))
     print(f"   ✅ Chemins sauvegardés : {Config.IMAGE_PATHS_FILE}")
     
+    # Sauvegarder la table des produits alignée sur les lignes de la matrice
+    ProductCatalog(table_products).save(Config.PRODUCTS_TABLE_FILE)
+    print(f"   ✅ Table des produits sauvegardée : {Config.PRODUCTS_TABLE_FILE}")
+    
     # Sauvegarder les produits valides
     valid_metadata = {
         'products': valid_products,
-        'categories': metadata['categories'],
+        'categories': categories,
         'total_products': len(valid_products)
     }
     
     valid_metadata_file = Config.METADATA_FILE.replace('.json', '_valid.json')
-    with open(valid_metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(valid_metadata, f, indent=4, ensure_ascii=False)
+    atomic_write(valid_metadata_file, lambda f: json.dump(valid_metadata, f, indent=4, ensure_ascii=False), mode='w')
     print(f"   ✅ Métadonnées valides : {valid_metadata_file}")
+
+def build_feature_database():
+    """
+    Construire la base de features pour TOUS les produits
+    Utilise automatiquement les images prétraitées si disponibles
+    """
+    print("=" * 70)
+    print("🚀 CONSTRUCTION DE LA BASE DE FEATURES")
+    print("=" * 70)
+    
+    # 1. Charger les métadonnées (images prétraitées si disponibles)
+    metadata = load_build_metadata()
+    
+    print(f"\n   📊 {metadata['total_products']} produits à traiter")
+    
+    # 2. Initialiser l'extracteur de features
+    print(f"\n🤖 Initialisation du modèle {Config.MODEL_NAME}...")
+    extractor = FeatureExtractor(Config.MODEL_NAME)
+    
+    # 3. Extraire les features de toutes les images
+    print("\n⚙️  Extraction des features en cours...")
+    print("   (Cela peut prendre 5-15 minutes selon votre machine)\n")
+    
+    # Ignorer les images absentes
+    products = []
+    for product in metadata['products']:
+        if os.path.exists(product['image_path']):
+            products.append(product)
+        else:
+            print(f"⚠️  Image non trouvée : {product['image_path']}")
     
-    # 7. Initialiser le système de recherche
+    features_matrix, valid, hashes = extract_features_pipeline(
+        extractor, [product['image_path'] for product in products]
+    )
+    
+    valid_products = [product for product, ok in zip(products, valid) if ok]
+    image_paths = [product['image_path'] for product in valid_products]
+    signatures = {}  # Signatures des images indexées (mises à jour incrémentales)
+    for product, ok, sha1 in zip(products, valid, hashes):
+        if ok:
+            signatures[product['image_path']] = file_signature(product['image_path'], sha1)
+        else:
+            print(f"❌ Échec extraction : {product['image_path']}")
+    
+    # 4. Matrice numpy (déjà remplie par le pipeline)
+    print(f"   ✅ Matrice créée : {features_matrix.shape}")
+    print(f"      • Nombre d'images : {features_matrix.shape[0]}")
+    print(f"      • Dimension des features : {features_matrix.shape[1]}")
+    
+    # Réduction de dimension : la matrice indexée et les requêtes sont projetées
+    projection = None
+    if Config.PCA_DIM:
+        projection = build_projection(features_matrix, image_paths)
+        features_matrix = projection.transform(features_matrix)
+        print(f"   ✅ Matrice projetée : {features_matrix.shape}")
+    elif os.path.exists(Config.PROJECTION_FILE):
+        # Projection d'une construction précédente : ne plus l'appliquer aux requêtes
+        os.remove(Config.PROJECTION_FILE)
+    
+    # 5. Sauvegarder les données
+    print(f"\n💾 Sauvegarde des données...")
+    save_feature_files(features_matrix, image_paths, valid_products, metadata['categories'])
+    
+    save_manifest(Config.FEATURES_MANIFEST_FILE, signatures, Config.MODEL_NAME)
+    print(f"   ✅ Manifest sauvegardé : {Config.FEATURES_MANIFEST_FILE}")
+    
+    # 6. Initialiser le système de recherche
     print(f"\n🔨 Initialisation du système de recherche...")
     print(f"   Métrique : Cosine Similarity")
     
+    ivf_index = None
+    if Config.SEARCH_INDEX == 'ivf':
+        ivf_index = build_ivf_index(features_matrix, image_paths)
+    
+    compressed_store = None
+    if Config.FEATURES_STORAGE in ('int8', 'pq'):
+        compressed_store = build_compressed_store(features_matrix, image_paths)
+    
     search_engine = SimilaritySearch(
         features_matrix=features_matrix,
         image_paths=image_paths,
-        metric='cosine'
+        metric='cosine',
+        index=ivf_index,
+        store=compressed_store,
+        rerank_factor=Config.RERANK_FACTOR
     )
     
     # Sauvegarder l'objet de recherche
     search_data_file = os.path.join(Config.FEATURES_DIR, 'search_engine.pkl')
     search_engine.save_data(search_data_file)
     
-    # 8. Récapitulatif
+    # 7. Récapitulatif
     print("\n" + "=" * 70)
     print("✅ BASE DE FEATURES CRÉÉE AVEC SUCCÈS !")
     print("=" * 70)
     print(f"📊 Statistiques finales :")
-    print(f"   • Images traitées : {len(features_list)} / {metadata['total_products']}")
-    print(f"   • Images prétraitées : {'Oui' if os.path.exists(preprocessed_metadata_file) else 'Non'}")
+    print(f"   • Images traitées : {len(image_paths)} / {metadata['total_products']}")
+    print(f"   • Images prétraitées : {'Oui' if os.path.exists(os.path.join(Config.DATA_DIR, 'metadata_preprocessed.json')) else 'Non'}")
     print(f"   • Dimension des features : {features_matrix.shape[1]}")
     print(f"   • Taille totale : {features_matrix.nbytes / (1024*1024):.2f} MB")
     print(f"   • Métrique de similarité : Cosine Similarity & Euclidean Distance")
@@ -143,7 +416,15 @@ def build_feature_database():
     print(f"   • features_db.pkl")
     print(f"   • features_matrix.npy")
     print(f"   • image_paths.pkl")
+    print(f"   • products_table.db")
+    print(f"   • manifest.json")
     print(f"   • search_engine.pkl")
+    if ivf_index is not None:
+        print(f"   • ivf_index.npz")
+    if compressed_store is not None:
+        print(f"   • features_{compressed_store.kind}.npz")
+    if projection is not None:
+        print(f"   • pca_projection.npz")
     print("=" * 70 + "\n")
     
     return features_matrix, image_paths
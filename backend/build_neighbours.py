@@ -0,0 +1,79 @@
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+
+from config import Config
+from utils.similarity_search import SimilaritySearch
+from utils.catalog import ProductCatalog
+from utils.neighbours import NeighbourTable
+from utils.search_state import files_version
+
+def build_neighbour_table(k=None, batch_size=None):
+    """
+    Précalculer les produits similaires de tout le catalogue à partir de la
+    matrice de features (aucune image n'est relue, le modèle n'est pas chargé)
+
+    Args:
+        k (int): Voisins gardés par produit (défaut : Config.NEIGHBOURS_K)
+        batch_size (int): Produits par produit matriciel (défaut : Config.NEIGHBOURS_BATCH_SIZE)
+
+    Returns:
+        NeighbourTable: Table construite
+    """
+    k = k or Config.NEIGHBOURS_K
+    batch_size = batch_size or Config.NEIGHBOURS_BATCH_SIZE
+
+    print("=" * 70)
+    print("🧭 CALCUL DES PRODUITS SIMILAIRES")
+    print("=" * 70)
+
+    # 1. Charger la matrice et la table des produits
+    print("\n📂 Chargement des features...")
+    features_matrix = np.load(Config.FEATURES_MATRIX_FILE, mmap_mode='r')
+    with open(Config.IMAGE_PATHS_FILE, 'rb') as f:
+        image_paths = pickle.load(f)
+    catalog = ProductCatalog.load(Config.PRODUCTS_TABLE_FILE)
+    catalog.check_alignment(image_paths, features_matrix.shape[0])
+    deleted = catalog.deleted
+    print(f"   ✅ Matrice : {features_matrix.shape}, {int(deleted.sum())} lignes supprimées")
+
+    # 2. Recherche exacte par blocs (indépendante de l'index IVF / du stockage compressé)
+    print(f"\n⚙️  Top-{k} de {features_matrix.shape[0]} produits (lots de {batch_size})...")
+    search_engine = SimilaritySearch(features_matrix, image_paths, metric='cosine', deleted=deleted)
+    start = time.perf_counter()
+    table = NeighbourTable.build(
+        search_engine, k=k, batch_size=batch_size, chunk_size=Config.SEARCH_CHUNK_SIZE,
+        source_version=files_version([Config.FEATURES_MATRIX_FILE])
+    )
+    elapsed = time.perf_counter() - start
+
+    # 3. Sauvegarder
+    table.save(Config.NEIGHBOURS_ROWS_FILE, Config.NEIGHBOURS_SCORES_FILE, Config.NEIGHBOURS_META_FILE)
+    size_mb = (table.rows.nbytes + table.scores.nbytes) / (1024 * 1024)
+
+    print("\n" + "=" * 70)
+    print("✅ PRODUITS SIMILAIRES CALCULÉS !")
+    print("=" * 70)
+    print(f"   • Produits : {len(table)}")
+    print(f"   • Voisins par produit : {k}")
+    print(f"   • Durée : {elapsed:.1f} s ({len(table) / max(elapsed, 1e-9):.0f} produits/s)")
+    print(f"   • Taille : {size_mb:.2f} MB")
+    print(f"\n📁 Fichiers créés dans : {Config.FEATURES_DIR}")
+    print(f"   • {os.path.basename(Config.NEIGHBOURS_ROWS_FILE)}")
+    print(f"   • {os.path.basename(Config.NEIGHBOURS_SCORES_FILE)}")
+    print(f"   • {os.path.basename(Config.NEIGHBOURS_META_FILE)}")
+    print("=" * 70 + "\n")
+
+    return table
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Précalcul des produits similaires du catalogue")
+    parser.add_argument('--k', type=int, default=None,
+                        help=f"Voisins par produit (défaut : {Config.NEIGHBOURS_K})")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help=f"Produits par produit matriciel (défaut : {Config.NEIGHBOURS_BATCH_SIZE})")
+    args = parser.parse_args()
+
+    build_neighbour_table(k=args.k, batch_size=args.batch_size)
@@ -15,16 +15,107 @@ class Config:
     FEATURES_DB_FILE = os.path.join(FEATURES_DIR, 'features_db.pkl')
     FEATURES_MATRIX_FILE = os.path.join(FEATURES_DIR, 'features_matrix.npy')
     IMAGE_PATHS_FILE = os.path.join(FEATURES_DIR, 'image_paths.pkl')
+    PRODUCTS_TABLE_FILE = os.path.join(FEATURES_DIR, 'products_table.db')  # Produits alignés sur la matrice (SQLite)
+    FEATURES_MANIFEST_FILE = os.path.join(FEATURES_DIR, 'manifest.json')  # Signatures des images indexées
+    UPDATE_CHECKPOINT_DIR = os.path.join(FEATURES_DIR, 'update_checkpoint')  # Une tranche extraite par fichier
+    TFLITE_MODEL_FILE = os.path.join(DATA_DIR, 'models', '{model}.tflite')  # {model} = nom du modèle en minuscules
+    IVF_INDEX_FILE = os.path.join(FEATURES_DIR, 'ivf_index.npz')
+    INT8_STORE_FILE = os.path.join(FEATURES_DIR, 'features_int8.npz')
+    PQ_STORE_FILE = os.path.join(FEATURES_DIR, 'features_pq.npz')
+    PROJECTION_FILE = os.path.join(FEATURES_DIR, 'pca_projection.npz')  # Projection PCA appliquée aux requêtes
+    NEIGHBOURS_ROWS_FILE = os.path.join(FEATURES_DIR, 'neighbours_rows.npy')  # Produits similaires précalculés
+    NEIGHBOURS_SCORES_FILE = os.path.join(FEATURES_DIR, 'neighbours_scores.npy')
+    NEIGHBOURS_META_FILE = os.path.join(FEATURES_DIR, 'neighbours.json')
     
     # Paramètres du modèle
-    IMAGE_SIZE = (224, 224)  # Taille pour ResNet50
+    IMAGE_SIZE = (224, 224)  # Taille d'entrée des modèles
+    # Modèle (models/backbones.py) : 'ResNet50', 'EfficientNetB0', 'MobileNetV3Large' ou 'MobileNetV3Small'.
+    # Les fichiers de l'index portent le nom du modèle qui les a produits : en changer impose une reconstruction
     MODEL_NAME = 'ResNet50'
     TOP_K_RESULTS = 10  # Nombre de résultats à retourner
     
+    # Inférence : 'tf_function' (graphe compilé), 'tflite' (CPU, XNNPACK) ou 'predict' (Keras)
+    INFERENCE_BACKEND = 'tf_function'
+    INFERENCE_THREADS = None  # Threads TFLite (None = choix automatique)
+    MODEL_WARMUP = True  # Exécuter le modèle une fois après son chargement
+    # Chargement du modèle : 'startup' (avant la première requête), 'background'
+    # (thread au démarrage, /ready répond 503 jusqu'à la fin) ou 'lazy' (à la
+    # première recherche par image : workers sans recherche par image)
+    MODEL_LOADING = 'background'
+    
+    # Micro-batching : les requêtes concurrentes partagent un passage du modèle
+    # (utile avec un serveur multi-threads, ex. gunicorn --threads)
+    MICRO_BATCHING = True
+    BATCH_MAX_SIZE = 16  # Images max par passage du modèle
+    BATCH_MAX_WAIT_MS = 5  # Attente max de la première image avant de lancer le lot
+    
+    # Mode asynchrone (asgi.py, ex. uvicorn asgi:app) : recherches par image
+    # exécutées dans un pool borné, réponse 503 au-delà de la file d'attente
+    ASYNC_INFERENCE_WORKERS = 16  # Threads de recherche (>= BATCH_MAX_SIZE pour remplir les lots)
+    ASYNC_QUEUE_LIMIT = 64  # Recherches max en cours ou en attente par worker
+    
+    # Cache des vecteurs de requête (même image renvoyée = pas de passage dans le modèle)
+    EMBEDDING_CACHE_SIZE = 1024  # Vecteurs gardés en mémoire par worker (0 = cache désactivé)
+    EMBEDDING_CACHE_TTL = 3600  # Durée de vie d'une entrée en secondes (None = illimitée)
+    EMBEDDING_CACHE_DIR = None  # Cache partagé entre workers, ex. os.path.join(DATA_DIR, 'cache', 'embeddings')
+    EMBEDDING_CACHE_DISK_MAX = 100000  # Fichiers max dans le cache disque
+    CACHE_SEARCH_RESULTS = True  # Garder aussi le top-k (invalidé à chaque nouvelle version de l'index)
+    
+    # Construction de la base de features
+    BUILD_BATCH_SIZE = 32  # Images par passage du modèle
+    BUILD_DECODE_WORKERS = min(8, os.cpu_count() or 1)  # Threads de décodage / redimensionnement
+    BUILD_PREFETCH_BATCHES = 2  # Lots décodés à l'avance pendant l'inférence
+    
+    # Prétraitement du dataset (preprocess_dataset.py)
+    PREPROCESS_WORKERS = os.cpu_count() or 1  # Processus de prétraitement (1 = séquentiel)
+    PREPROCESS_CHUNK_SIZE = 16  # Images envoyées à un processus par envoi
+    
+    # Mise à jour incrémentale de la base de features
+    UPDATE_CHECKPOINT_EVERY = 512  # Images extraites entre deux points de reprise
+    UPDATE_COMPACT_RATIO = 0.2  # Compacter la matrice au-delà de 20 % de lignes supprimées
+    
+    # Recherche par lot
+    MAX_BATCH_IMAGES = 16  # Nombre max d'images par requête /api/search/images
+    TEXT_SEARCH_MAX_LIMIT = 100  # Résultats max par page de /api/search/text
+    PRODUCTS_PAGE_SIZE = 100  # Produits par page par défaut de /api/products/all
+    PRODUCTS_MAX_LIMIT = 1000  # Produits max par page de /api/products/all (hors streaming)
+    PRODUCTS_STREAM_BATCH = 1000  # Produits lus par bloc en mode streaming (NDJSON)
+    
+    # Produits similaires précalculés (build_neighbours.py, /api/products/<id>/similar)
+    NEIGHBOURS_K = 20  # Voisins gardés par produit
+    NEIGHBOURS_BATCH_SIZE = 512  # Produits traités par produit matriciel
+    SEARCH_CHUNK_SIZE = 50000  # Lignes du catalogue scorées par bloc (limite la mémoire)
+    
+    # Index de recherche : 'flat' (exact, force brute) ou 'ivf' (approximatif)
+    SEARCH_INDEX = 'flat'
+    IVF_N_LISTS = None  # None = ~ 4 * racine(nombre de produits)
+    IVF_NPROBE = 8  # Listes visitées par requête (plus = meilleur rappel, plus lent)
+    
+    # Réduction de dimension (PCA) des vecteurs indexés et des requêtes
+    PCA_DIM = None  # Dimension après projection, ex. 256 ou 512 (None = vecteurs complets du modèle)
+    PCA_WHITEN = False  # Blanchiment : variance unitaire pour chaque composante
+    PCA_SAMPLE_SIZE = 50000  # Vecteurs utilisés pour estimer les composantes
+    PCA_REPORT_DIMS = (64, 128, 256, 512, 1024)  # Dimensions comparées dans le rapport rappel@k
+    
+    # Ouvrir la matrice en lecture seule (memmap) : pages partagées entre les workers Gunicorn
+    FEATURES_MMAP = True
+    
+    # Stockage des features : 'float32' (aucune compression), 'int8' (4x) ou 'pq' (dimension / PQ_M x)
+    FEATURES_STORAGE = 'float32'
+    PQ_M = 256  # Sous-espaces du PQ = octets par produit (ResNet50 : 2048 / 256 -> 32x), doit diviser la dimension
+    RERANK_FACTOR = 10  # Short-list re-classée en float32 = top_k * RERANK_FACTOR
+    FILTER_EXACT_MAX_ROWS = 20000  # Filtres : sous-ensemble scoré exactement en dessous de cette taille
+    
+    # Rechargement à chaud de l'index (POST /api/admin/reload)
+    INDEX_WATCH_INTERVAL = None  # Surveiller les fichiers de l'index toutes les N secondes (None = désactivé)
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Jeton des routes d'administration (None = routes désactivées)
+    
     # Configuration Flask
     UPLOAD_FOLDER = UPLOADS_DIR
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max
+    METADATA_DB = True  # Métadonnées converties en base SQLite (lecture à la demande) au lieu du JSON complet
+    SAVE_UPLOADS = False  # Debug : passer les images reçues par le disque au lieu de les décoder en mémoire
     
     # URL de base pour les images
     STATIC_URL = '/static/products'
\ No newline at end of file
@@ -2,6 +2,8 @@ import os
 import json
 from pathlib import Path
 from config import Config
+from utils.catalog import image_url_for
+from utils.database import ProductDatabase
 
 def create_metadata():
     """
@@ -42,7 +44,7 @@ def create_metadata():
                         'name': f"{category_folder.capitalize()} #{product_id}",
                         'category': category_folder,
                         'image_path': image_path.replace('\\', '/'),
-                        'image_url': f"/products/{category_folder}/{image_file}",
+                        'image_url': image_url_for(image_path),
                         'price': f"{(20 + (product_id * 7) % 180)}.99 €",
                         'description': f"Beautiful {category_folder} from our collection",
                         'in_stock': True
@@ -63,6 +65,9 @@ def create_metadata():
     with open(Config.METADATA_FILE, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, indent=4, ensure_ascii=False)
     
+    # Version binaire (SQLite) lue par l'API
+    ProductDatabase.from_json(Config.METADATA_FILE)
+    
     print(f"\n{'='*70}")
     print(f"✅ MÉTADONNÉES CRÉÉES AVEC SUCCÈS !")
     print(f"{'='*70}")
@@ -70,7 +75,7 @@ def create_metadata():
     print(f"   • Produits totaux : {metadata['total_products']}")
     print(f"   • Catégories : {len(metadata['categories'])}")
     print(f"   • Liste des catégories : {', '.join(metadata['categories'])}")
-    print(f"\n💾 Fichier sauvegardé : {Config.METADATA_FILE}")
+    print(f"\n💾 Fichier sauvegardé : {Config.METADATA_FILE} (+ {os.path.splitext(Config.METADATA_FILE)[0]}.db)")
     print(f"{'='*70}\n")
     
     return metadata
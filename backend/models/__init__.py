@@ -3,5 +3,6 @@
 # models/__init__.py
 """Package models"""
 from .feature_extractor import FeatureExtractor
+from .batching import MicroBatcher
 
-__all__ = ['FeatureExtractor']
+__all__ = ['FeatureExtractor', 'MicroBatcher']
@@ -0,0 +1,70 @@
+import importlib
+from typing import NamedTuple
+
+
+class Backbone(NamedTuple):
+    """
+    Modèle pré-entraîné (ImageNet) utilisable comme extracteur de features :
+    module Keras importé à la demande, prétraitement propre au modèle
+    (preprocess_input du module) et dimension du vecteur après Global Average Pooling
+    """
+    module: str       # Module tensorflow.keras.applications du modèle
+    constructor: str  # Fonction du module qui construit le modèle
+    output_dim: int   # Dimension du vecteur de features
+    description: str
+
+    def build(self, input_size):
+        """
+        Construire le modèle sans la couche de classification
+
+        Args:
+            input_size (tuple): (hauteur, largeur) des images
+
+        Returns:
+            tuple: (modèle Keras, fonction de prétraitement des images RGB 0-255)
+        """
+        module = importlib.import_module(self.module)
+        model = getattr(module, self.constructor)(
+            weights='imagenet',   # Poids pré-entraînés
+            include_top=False,    # Sans couche de classification
+            pooling='avg',        # Global Average Pooling : vecteur de taille fixe
+            input_shape=tuple(input_size) + (3,)
+        )
+        return model, module.preprocess_input
+
+
+# Modèles disponibles pour Config.MODEL_NAME, du plus précis au plus rapide sur CPU
+BACKBONES = {
+    'ResNet50': Backbone(
+        'tensorflow.keras.applications.resnet50', 'ResNet50', 2048,
+        "Référence (~4 GFLOPs), prétraitement 'caffe' (BGR, moyenne ImageNet)"
+    ),
+    'EfficientNetB0': Backbone(
+        'tensorflow.keras.applications.efficientnet', 'EfficientNetB0', 1280,
+        "~0.4 GFLOPs, normalisation intégrée au modèle"
+    ),
+    'MobileNetV3Large': Backbone(
+        'tensorflow.keras.applications.mobilenet_v3', 'MobileNetV3Large', 960,
+        "~0.22 GFLOPs, normalisation intégrée au modèle"
+    ),
+    'MobileNetV3Small': Backbone(
+        'tensorflow.keras.applications.mobilenet_v3', 'MobileNetV3Small', 576,
+        "~0.06 GFLOPs, normalisation intégrée au modèle"
+    ),
+}
+
+
+def get_backbone(model_name):
+    """
+    Args:
+        model_name (str): Nom du modèle (clé de BACKBONES)
+
+    Returns:
+        Backbone: Description du modèle
+
+    Raises:
+        ValueError: Si le modèle n'est pas dans le registre
+    """
+    if model_name not in BACKBONES:
+        raise ValueError(f"Modèle inconnu : {model_name} (disponibles : {', '.join(BACKBONES)})")
+    return BACKBONES[model_name]
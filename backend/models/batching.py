@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def latency_summary(values_ms):
+    """
+    Résumé (moyenne, p50, p95, max) d'une série de durées en millisecondes
+    """
+    if len(values_ms) == 0:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    values = np.asarray(values_ms)
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'max': round(float(values.max()), 3)
+    }
+
+
+class BatchingMetrics:
+    """
+    Statistiques du micro-batching : distribution des tailles de lot,
+    attente en file et durée d'inférence (sur les `window` derniers lots)
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.n_batches = 0
+        self.n_requests = 0
+        self.queue_waits_ms = deque(maxlen=window * 8)
+        self.inference_ms = deque(maxlen=window)
+
+    def record(self, batch_size, queue_waits_ms, inference_ms):
+        with self._lock:
+            self.batch_sizes[batch_size] += 1
+            self.n_batches += 1
+            self.n_requests += batch_size
+            self.queue_waits_ms.extend(queue_waits_ms)
+            self.inference_ms.append(inference_ms)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Métriques sérialisables en JSON
+        """
+        with self._lock:
+            return {
+                'batches': self.n_batches,
+                'requests': self.n_requests,
+                'mean_batch_size': round(self.n_requests / self.n_batches, 2) if self.n_batches else 0.0,
+                'batch_size_distribution': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': latency_summary(list(self.queue_waits_ms)),
+                'inference_ms': latency_summary(list(self.inference_ms))
+            }
+
+
+class _PendingImage:
+    __slots__ = ('image', 'future', 'enqueued_at')
+
+    def __init__(self, image):
+        self.image = image
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Regrouper les requêtes concurrentes en lots avant le passage dans le modèle.
+
+    Chaque requête dépose son image dans une file ; un thread unique forme un lot
+    dès que `max_batch_size` images sont en attente ou que la plus ancienne a attendu
+    `max_wait_ms`, exécute un seul passage du modèle et renvoie à chaque appelant
+    son vecteur de features.
+    """
+
+    def __init__(self, feature_extractor, max_batch_size=16, max_wait_ms=5.0):
+        """
+        Args:
+            feature_extractor (FeatureExtractor): Extracteur utilisé pour les lots
+            max_batch_size (int): Taille maximale d'un lot
+            max_wait_ms (float): Attente maximale de la première image d'un lot
+        """
+        self.feature_extractor = feature_extractor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = BatchingMetrics()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array, timeout=None):
+        """
+        Extraire les features d'une image décodée (bloquant jusqu'au résultat)
+
+        Args:
+            img_array (numpy.ndarray): Image RGB (224, 224, 3)
+            timeout (float): Attente maximale en secondes (None = illimitée)
+
+        Returns:
+            numpy.ndarray: Vecteur de features normalisé
+        """
+        pending = _PendingImage(img_array)
+        self._queue.put(pending)
+        return pending.future.result(timeout=timeout)
+
+    def submit_many(self, img_arrays, timeout=None):
+        """
+        Extraire les features de plusieurs images (regroupées avec les autres requêtes)
+
+        Returns:
+            numpy.ndarray: Matrice de features (n, dimension)
+        """
+        pending = [_PendingImage(img_array) for img_array in img_arrays]
+        for item in pending:
+            self._queue.put(item)
+        return np.stack([item.future.result(timeout=timeout) for item in pending])
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.perf_counter()
+
+            try:
+                features = self.feature_extractor.extract_features_from_array(
+                    np.stack([item.image for item in batch])
+                )
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            for item, feature in zip(batch, features):
+                item.future.set_result(feature)
+
+            finished_at = time.perf_counter()
+            self.metrics.record(
+                len(batch),
+                [(started_at - item.enqueued_at) * 1000 for item in batch],
+                (finished_at - started_at) * 1000
+            )
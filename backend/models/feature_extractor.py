@@ -1,39 +1,192 @@
-import tensorflow as tf
-from tensorflow.keras.applications import ResNet50
-from tensorflow.keras.applications.resnet50 import preprocess_input
-from tensorflow.keras.preprocessing import image
 import numpy as np
 import os
+import threading
+from PIL import Image
+import io
 from config import Config
+from models.backbones import get_backbone
+from utils.manifest import atomic_write
+
+# TensorFlow n'est importé qu'à la création du premier FeatureExtractor
+# (import_tensorflow) : le décodage des images et les routes sans modèle
+# n'en paient pas le coût au démarrage
+tf = None
+image = None
+_tensorflow_lock = threading.Lock()
+
+def import_tensorflow():
+    """
+    Importer TensorFlow et les modules Keras utilisés par FeatureExtractor (une seule fois)
+    """
+    global tf, image
+    with _tensorflow_lock:
+        if tf is not None:
+            return
+        import tensorflow
+        from tensorflow.keras.preprocessing import image as keras_image
+        image = keras_image
+        tf = tensorflow  # Affecté en dernier : tf non nul = tous les modules disponibles
+
+def decode_image_bytes(data, out=None):
+    """
+    Décoder une image en mémoire, comme image.load_img (RGB, redimensionnement 'nearest')
+    
+    Args:
+        data (bytes): Contenu du fichier image
+        out (numpy.ndarray): Tableau float32 (224, 224, 3) où écrire l'image (sans allocation)
+        
+    Returns:
+        numpy.ndarray: Image RGB float32 (224, 224, 3)
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # PIL utilise (largeur, hauteur), Config.IMAGE_SIZE est (hauteur, largeur)
+    width_height = (Config.IMAGE_SIZE[1], Config.IMAGE_SIZE[0])
+    if img.size != width_height:
+        img = img.resize(width_height, Image.NEAREST)
+    if out is not None:
+        out[...] = np.asarray(img)  # Conversion uint8 -> float32 directement dans `out`
+        return out
+    return np.asarray(img, dtype=np.float32)
+
+def load_image_array(img_path, out=None):
+    """
+    Charger une image depuis le disque (même décodage que image.load_img),
+    utilisable depuis des threads de décodage sans passer par TensorFlow
+    
+    Args:
+        img_path (str): Chemin vers l'image
+        out (numpy.ndarray): Tableau float32 (224, 224, 3) où écrire l'image (sans allocation)
+    
+    Returns:
+        numpy.ndarray: Image RGB float32 (224, 224, 3)
+    """
+    with open(img_path, 'rb') as f:
+        return decode_image_bytes(f.read(), out=out)
 
 class FeatureExtractor:
     """
-    Extracteur de features utilisant ResNet50 pré-entraîné sur ImageNet
+    Extracteur de features utilisant un modèle pré-entraîné sur ImageNet
+    du registre models/backbones.py (ResNet50, EfficientNetB0, MobileNetV3...)
     """
     
-    def __init__(self, model_name='ResNet50'):
+    def __init__(self, model_name='ResNet50', backend=None, projection=None):
         """
         Initialiser le modèle pré-entraîné
         
         Args:
-            model_name (str): Nom du modèle à utiliser
+            model_name (str): Nom du modèle à utiliser (clé de BACKBONES)
+            backend (str): Chemin d'inférence 'tf_function', 'tflite' ou 'predict'
+                (défaut : Config.INFERENCE_BACKEND)
+            projection (PCAProjection): Réduction de dimension appliquée aux vecteurs
+                extraits (None = vecteurs complets)
         """
+        self.model_name = model_name
+        self.backbone = get_backbone(model_name)
+        
         print(f"🔄 Chargement du modèle {model_name}...")
+        import_tensorflow()
         
-        # Charger ResNet50 sans la couche de classification (include_top=False)
-        # pooling='avg' pour obtenir un vecteur de features de taille fixe
-        self.model = ResNet50(
-            weights='imagenet',      # Poids pré-entraînés
-            include_top=False,       # Sans couche de classification
-            pooling='avg',           # Global Average Pooling
-            input_shape=(224, 224, 3)
-        )
+        # Modèle sans la couche de classification et prétraitement qui lui est propre
+        self.model, self.preprocess = self.backbone.build(Config.IMAGE_SIZE)
         
         # Le modèle ne sera pas entraîné
         self.model.trainable = False
         
+        self.projection = projection
+        
+        # Chemin d'inférence rapide (évite la préparation de predict() à chaque appel)
+        self.backend = backend or Config.INFERENCE_BACKEND
+        self._run_model = self._build_inference(self.backend)
+        
         print(f"✅ Modèle {model_name} chargé avec succès!")
         print(f"   📊 Dimension du vecteur de features : {self.model.output_shape[1]}")
+        if projection is not None:
+            print(f"   📐 Projection PCA : {projection.input_dim} -> {projection.dim}")
+        print(f"   ⚡ Inférence : {self.backend}")
+    
+    @property
+    def output_dim(self):
+        """
+        Dimension des vecteurs retournés (après projection éventuelle)
+        """
+        return self.projection.dim if self.projection is not None else self.model.output_shape[1]
+    
+    def _build_inference(self, backend):
+        """
+        Construire la fonction d'inférence : batch prétraité (n, 224, 224, 3) -> features (n, d)
+        
+        Args:
+            backend (str): 'tf_function', 'tflite' ou 'predict'
+        """
+        if backend == 'predict':
+            # Ancien chemin : adaptateur de données et callbacks Keras à chaque appel
+            return lambda batch: self.model.predict(batch, verbose=0)
+        
+        if backend == 'tflite':
+            return self._build_tflite_inference()
+        
+        if backend != 'tf_function':
+            raise ValueError(f"Backend d'inférence inconnu : {backend}")
+        
+        # Graphe compilé une seule fois avec une signature fixe (seul le batch varie)
+        input_shape = (None,) + tuple(Config.IMAGE_SIZE) + (3,)
+        
+        @tf.function(input_signature=[tf.TensorSpec(input_shape, tf.float32)])
+        def serve(batch):
+            return self.model(batch, training=False)
+        
+        return lambda batch: serve(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+    
+    def _build_tflite_inference(self):
+        """
+        Inférence TFLite (CPU, délégué XNNPACK par défaut), modèle converti une fois
+        et mis en cache dans Config.TFLITE_MODEL_FILE (un fichier par modèle)
+        """
+        tflite_file = Config.TFLITE_MODEL_FILE.format(model=self.model_name.lower())
+        if not os.path.exists(tflite_file):
+            print("   🔄 Conversion du modèle en TFLite...")
+            converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+            tflite_model = converter.convert()
+            os.makedirs(os.path.dirname(tflite_file), exist_ok=True)
+            # Écriture atomique : un autre worker ne voit jamais un fichier à moitié écrit
+            atomic_write(tflite_file, lambda f: f.write(tflite_model))
+        
+        interpreter = tf.lite.Interpreter(
+            model_path=tflite_file,
+            num_threads=Config.INFERENCE_THREADS
+        )
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+        # L'interpréteur n'est pas thread-safe et doit être ré-alloué si la taille du batch change
+        lock = threading.Lock()
+        allocated_shape = [None]
+        
+        def run(batch):
+            batch = np.ascontiguousarray(batch, dtype=np.float32)
+            with lock:
+                if allocated_shape[0] != batch.shape:
+                    interpreter.resize_tensor_input(input_index, batch.shape)
+                    interpreter.allocate_tensors()
+                    allocated_shape[0] = batch.shape
+                interpreter.set_tensor(input_index, batch)
+                interpreter.invoke()
+                return interpreter.get_tensor(output_index).copy()
+        
+        return run
+    
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Exécuter le modèle sur des images vides pour que la première vraie requête
+        ne paie pas la compilation du graphe / l'allocation des tenseurs
+        
+        Args:
+            batch_sizes (tuple): Tailles de batch à préparer
+        """
+        for batch_size in batch_sizes:
+            self._run_model(np.zeros((batch_size,) + tuple(Config.IMAGE_SIZE) + (3,), dtype=np.float32))
     
     def extract_features(self, img_path):
         """
@@ -43,83 +196,120 @@ class FeatureExtractor:
             img_path (str): Chemin vers l'image
             
         Returns:
-            numpy.ndarray: Vecteur de features normalisé (2048 dimensions)
+            numpy.ndarray: Vecteur de features normalisé (output_dim dimensions)
         """
         try:
             # 1. Charger l'image et la redimensionner
             img = image.load_img(img_path, target_size=Config.IMAGE_SIZE)
             
-            # 2. Convertir en array numpy
-            img_array = image.img_to_array(img)
-            
-            # 3. Ajouter une dimension batch (le modèle attend (batch, height, width, channels))
-            img_array = np.expand_dims(img_array, axis=0)
-            
-            # 4. Prétraiter selon ResNet50 (normalisation spécifique)
-            img_array = preprocess_input(img_array)
-            
-            # 5. Extraire les features
-            features = self.model.predict(img_array, verbose=0)
-            
-            # 6. Aplatir le vecteur (de (1, 2048) vers (2048,))
-            features = features.flatten()
-            
-            # 7. Normaliser le vecteur (norme L2)
-            # Cela permet de comparer les similarités avec le cosine similarity
-            norm = np.linalg.norm(features)
-            if norm != 0:
-                features = features / norm
-            
-            return features
+            # 2. Convertir en array numpy puis extraire les features
+            return self.extract_features_from_array(image.img_to_array(img))
             
         except Exception as e:
             print(f"❌ Erreur lors de l'extraction de {img_path}: {e}")
             return None
     
+    def extract_features_from_bytes(self, data):
+        """
+        Extraire les features d'une image encodée (contenu d'un upload),
+        décodée en mémoire sans passer par le disque
+        
+        Args:
+            data (bytes): Contenu du fichier image (PNG, JPEG...)
+            
+        Returns:
+            numpy.ndarray: Vecteur de features normalisé, None en cas d'erreur
+        """
+        try:
+            return self.extract_features_from_array(decode_image_bytes(data))
+        except Exception as e:
+            print(f"❌ Erreur lors de l'extraction depuis les octets reçus : {e}")
+            return None
+    
+    def extract_features_from_array(self, img_array):
+        """
+        Extraire les features d'une image déjà décodée
+        
+        Args:
+            img_array (numpy.ndarray): Image RGB (224, 224, 3) ou lot d'images (n, 224, 224, 3)
+            
+        Returns:
+            numpy.ndarray: Vecteur (output_dim,) ou matrice (n, output_dim) normalisés (norme L2)
+        """
+        # Copie : le prétraitement (ex. preprocess_input de ResNet50) modifie
+        # le tableau en place, l'image de l'appelant doit rester intacte
+        img_array = np.array(img_array, dtype=np.float32)
+        single = img_array.ndim == 3
+        
+        # Ajouter une dimension batch (le modèle attend (batch, height, width, channels))
+        batch = img_array[np.newaxis] if single else img_array
+        
+        # Prétraiter selon le modèle (normalisation spécifique) puis extraire les features
+        features = self._run_model(self.preprocess(batch))
+        features = features.reshape(len(batch), -1)
+        
+        # Normaliser chaque vecteur (norme L2) pour la similarité cosinus
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        features = features / norms
+        
+        if self.projection is not None:
+            features = self.projection.transform(features)
+        
+        return features[0] if single else features
+    
     def extract_features_batch(self, img_paths, batch_size=32):
         """
         Extraire les features pour un lot d'images (plus rapide)
         
+        Les images sont décodées dans un buffer (batch_size, 224, 224, 3) réutilisé
+        d'un lot à l'autre et les vecteurs normalisés sont écrits directement dans
+        la matrice de sortie, ligne i = image i (une image illisible laisse une
+        ligne de zéros au lieu de décaler les suivantes).
+        
         Args:
             img_paths (list): Liste des chemins d'images
             batch_size (int): Taille du lot
             
         Returns:
-            numpy.ndarray: Matrice de features (n_images, 2048)
+            tuple: (matrice de features (n_images, output_dim) alignée sur img_paths,
+                    indices des images en échec)
         """
-        all_features = []
+        features = np.zeros((len(img_paths), self.output_dim), dtype=np.float32)
+        failed = []
+        buffer = np.empty((min(batch_size, len(img_paths)),) + tuple(Config.IMAGE_SIZE) + (3,), dtype=np.float32)
         
         for i in range(0, len(img_paths), batch_size):
             batch_paths = img_paths[i:i+batch_size]
-            batch_images = []
+            rows = []
             
-            # Charger et prétraiter le lot d'images
-            for img_path in batch_paths:
+            # Décoder les images lisibles au début du buffer
+            for row, img_path in enumerate(batch_paths, start=i):
                 try:
-                    img = image.load_img(img_path, target_size=Config.IMAGE_SIZE)
-                    img_array = image.img_to_array(img)
-                    batch_images.append(img_array)
+                    load_image_array(img_path, out=buffer[len(rows)])
+                    rows.append(row)
                 except Exception as e:
                     print(f"⚠️  Erreur sur {img_path}: {e}")
-                    continue
+                    failed.append(row)
+            
+            if not rows:
+                continue
             
-            if len(batch_images) > 0:
-                # Convertir en array et prétraiter
-                batch_array = np.array(batch_images)
-                batch_array = preprocess_input(batch_array)
-                
-                # Extraire les features
-                features = self.model.predict(batch_array, verbose=0)
-                
-                # Normaliser
-                for j in range(len(features)):
-                    feature = features[j].flatten()
-                    norm = np.linalg.norm(feature)
-                    if norm != 0:
-                        feature = feature / norm
-                    all_features.append(feature)
-        
-        return np.array(all_features)
+            # Prétraiter (en place dans le buffer) et extraire les features
+            batch_features = self._run_model(self.preprocess(buffer[:len(rows)]))
+            batch_features = batch_features.reshape(len(rows), -1)
+            
+            # Normaliser le lot en une opération (norme L2)
+            norms = np.linalg.norm(batch_features, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            if self.projection is not None:
+                features[rows] = self.projection.transform(batch_features / norms)
+            elif len(rows) == len(batch_paths):
+                np.divide(batch_features, norms, out=features[i:i + len(rows)])
+            else:
+                features[rows] = batch_features / norms
+        
+        return features, failed
 
 # Test du module
 if __name__ == '__main__':
@@ -1,16 +1,88 @@
 import os
+import argparse
+import time
 import cv2
 import numpy as np
+from multiprocessing import Pool
 from pathlib import Path
 from tqdm import tqdm
 from config import Config
 from preprocessing.image_preprocessing import ImagePreprocessor
+from utils.catalog import image_url_for
+from utils.database import ProductDatabase
 import json
 
-def preprocess_all_images():
+# Préprocesseur du processus courant (un par worker : objet CLAHE réutilisé)
+_preprocessor = None
+
+def init_worker(target_size, opencv_threads=1):
+    """
+    Initialiser un processus de prétraitement
+
+    Args:
+        target_size (tuple): Taille cible des images
+        opencv_threads (int): Threads internes d'OpenCV (1 en mode multi-processus
+            pour éviter la sur-souscription des cœurs)
+    """
+    global _preprocessor
+    cv2.setNumThreads(opencv_threads)
+    _preprocessor = ImagePreprocessor(target_size=target_size)
+
+def preprocess_product(task):
+    """
+    Prétraiter l'image d'un produit et l'écrire dans le dossier preprocessed.
+    Seul un petit dictionnaire revient au processus principal (jamais l'image).
+
+    Args:
+        task (tuple): (produit, dossier des images prétraitées)
+
+    Returns:
+        tuple: (produit mis à jour ou None, message d'erreur ou None)
+    """
+    product, preprocessed_dir = task
+    img_path = product['image_path']
+    
+    if not os.path.exists(img_path):
+        return None, f"⚠️  Image non trouvée : {img_path}"
+    
+    try:
+        # Chemin de sortie : preprocessed/<catégorie>/<fichier>
+        output_path = os.path.join(preprocessed_dir, product['category'], os.path.basename(img_path))
+        
+        # Prétraiter l'image
+        img = _preprocessor.preprocess_image(img_path, enhance=True)
+        
+        if img is None:
+            return None, None
+        
+        # Reconvertir en uint8 pour sauvegarder
+        img_to_save = (img * 255).astype(np.uint8)
+        img_to_save = cv2.cvtColor(img_to_save, cv2.COLOR_RGB2BGR)
+        
+        # Sauvegarder
+        cv2.imwrite(output_path, img_to_save)
+        
+        # Mettre à jour les métadonnées
+        product_copy = product.copy()
+        product_copy['original_image_path'] = img_path
+        product_copy['image_path'] = output_path
+        product_copy['image_url'] = image_url_for(output_path)
+        return product_copy, None
+    
+    except Exception as e:
+        return None, f"❌ Erreur sur {img_path}: {e}"
+
+def preprocess_all_images(workers=None, chunk_size=None):
     """
     Prétraiter toutes les images du dataset et les sauvegarder
+    
+    Args:
+        workers (int): Nombre de processus (défaut : Config.PREPROCESS_WORKERS, 1 = séquentiel)
+        chunk_size (int): Images envoyées à un processus par envoi (défaut : Config.PREPROCESS_CHUNK_SIZE)
     """
+    workers = workers or Config.PREPROCESS_WORKERS
+    chunk_size = chunk_size or Config.PREPROCESS_CHUNK_SIZE
+    
     print("=" * 70)
     print("🖼️  PRÉTRAITEMENT DE TOUTES LES IMAGES")
     print("=" * 70)
@@ -26,61 +98,45 @@ def preprocess_all_images():
     
     print(f"   ✅ {metadata['total_products']} images à prétraiter")
     
-    # Initialiser le préprocesseur
-    print("\n🔧 Initialisation du préprocesseur...")
-    preprocessor = ImagePreprocessor(target_size=Config.IMAGE_SIZE)
+    # Créer les dossiers de catégorie avant de répartir le travail
+    for category in {product['category'] for product in metadata['products']}:
+        os.makedirs(os.path.join(preprocessed_dir, category), exist_ok=True)
     
     # Statistiques
     success_count = 0
     failed_count = 0
     preprocessed_products = []
     
-    print("\n⚙️  Prétraitement en cours...\n")
+    tasks = [(product, preprocessed_dir) for product in metadata['products']]
+    start = time.perf_counter()
     
-    # Prétraiter chaque image
-    for product in tqdm(metadata['products'], desc="Prétraitement", unit="image"):
-        img_path = product['image_path']
+    if workers > 1:
+        print(f"\n🔧 Initialisation de {workers} processus (lots de {chunk_size} images)...")
+        print("\n⚙️  Prétraitement en cours...\n")
         
-        if not os.path.exists(img_path):
-            print(f"\n⚠️  Image non trouvée : {img_path}")
-            failed_count += 1
-            continue
+        # imap : résultats rendus dans l'ordre des produits, au fil de l'eau
+        with Pool(workers, initializer=init_worker, initargs=(Config.IMAGE_SIZE,)) as pool:
+            results = list(tqdm(
+                pool.imap(preprocess_product, tasks, chunksize=chunk_size),
+                total=len(tasks), desc="Prétraitement", unit="image"
+            ))
+    else:
+        # Initialiser le préprocesseur
+        print("\n🔧 Initialisation du préprocesseur...")
+        init_worker(Config.IMAGE_SIZE, opencv_threads=cv2.getNumThreads())
+        print("\n⚙️  Prétraitement en cours...\n")
         
-        try:
-            # Extraire le nom de catégorie et fichier
-            category = product['category']
-            filename = os.path.basename(img_path)
-            
-            # Créer le dossier de catégorie dans preprocessed
-            category_preprocessed_dir = os.path.join(preprocessed_dir, category)
-            os.makedirs(category_preprocessed_dir, exist_ok=True)
-            
-            # Chemin de sortie
-            output_path = os.path.join(category_preprocessed_dir, filename)
-            
-            # Prétraiter l'image
-            img = preprocessor.preprocess_image(img_path, enhance=True)
-            
-            if img is not None:
-                # Reconvertir en uint8 pour sauvegarder
-                img_to_save = (img * 255).astype(np.uint8)
-                img_to_save = cv2.cvtColor(img_to_save, cv2.COLOR_RGB2BGR)
-                
-                # Sauvegarder
-                cv2.imwrite(output_path, img_to_save)
-                
-                # Mettre à jour les métadonnées
-                product_copy = product.copy()
-                product_copy['original_image_path'] = img_path
-                product_copy['image_path'] = output_path
-                preprocessed_products.append(product_copy)
-                
-                success_count += 1
-            else:
-                failed_count += 1
-                
-        except Exception as e:
-            print(f"\n❌ Erreur sur {img_path}: {e}")
+        results = [preprocess_product(task) for task in tqdm(tasks, desc="Prétraitement", unit="image")]
+    
+    elapsed = time.perf_counter() - start
+    
+    for product_copy, error in results:
+        if product_copy is not None:
+            preprocessed_products.append(product_copy)
+            success_count += 1
+        else:
+            if error:
+                print(f"\n{error}")
             failed_count += 1
     
     # Sauvegarder les nouvelles métadonnées
@@ -94,6 +150,9 @@ def preprocess_all_images():
     with open(preprocessed_metadata_file, 'w', encoding='utf-8') as f:
         json.dump(preprocessed_metadata, f, indent=4, ensure_ascii=False)
     
+    # Version binaire (SQLite) lue par l'API
+    ProductDatabase.from_json(preprocessed_metadata_file)
+    
     # Récapitulatif
     print("\n" + "=" * 70)
     print("✅ PRÉTRAITEMENT TERMINÉ !")
@@ -102,6 +161,7 @@ def preprocess_all_images():
     print(f"   • Images prétraitées avec succès : {success_count}")
     print(f"   • Images en échec : {failed_count}")
     print(f"   • Taux de réussite : {(success_count/metadata['total_products']*100):.1f}%")
+    print(f"   • Durée : {elapsed:.1f} s ({len(tasks) / max(elapsed, 1e-9):.1f} images/s, {workers} processus)")
     print(f"\n📁 Images prétraitées sauvegardées dans : {preprocessed_dir}")
     print(f"📄 Métadonnées : {preprocessed_metadata_file}")
     print("=" * 70 + "\n")
@@ -110,4 +170,11 @@ def preprocess_all_images():
     print("   (Le script utilisera automatiquement les images prétraitées)\n")
 
 if __name__ == '__main__':
-    preprocess_all_images()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Prétraitement des images du dataset")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Nombre de processus (défaut : {Config.PREPROCESS_WORKERS}, 1 = séquentiel)")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f"Images par envoi à un processus (défaut : {Config.PREPROCESS_CHUNK_SIZE})")
+    args = parser.parse_args()
+    
+    preprocess_all_images(workers=args.workers, chunk_size=args.chunk_size)
@@ -15,6 +15,16 @@ class ImagePreprocessor:
             target_size (tuple): Taille cible (largeur, hauteur)
         """
         self.target_size = target_size or Config.IMAGE_SIZE
+        self._clahe = None  # Créé au premier usage (non sérialisable : un par processus)
+    
+    @property
+    def clahe(self):
+        """
+        Objet CLAHE réutilisé pour toutes les images traitées par ce préprocesseur
+        """
+        if self._clahe is None:
+            self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        return self._clahe
     
     def preprocess_image(self, image_path, enhance=False):
         """
@@ -70,8 +80,7 @@ class ImagePreprocessor:
         l, a, b = cv2.split(lab)
         
         # Appliquer CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
+        l = self.clahe.apply(l)
         
         # Fusionner et reconvertir en RGB
         lab = cv2.merge([l, a, b])
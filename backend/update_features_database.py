@@ -0,0 +1,330 @@
+import os
+import pickle
+import shutil
+import time
+import numpy as np
+
+from config import Config
+from models.feature_extractor import FeatureExtractor
+from utils.similarity_search import SimilaritySearch
+from utils.ann_index import IVFIndex
+from utils.quantization import load_compressed_store
+from utils.projection import PCAProjection
+from utils.catalog import ProductCatalog
+from utils.manifest import file_signature, has_changed, atomic_write, save_manifest, load_manifest
+from build_features_database import (
+    load_build_metadata, save_feature_files, extract_features_pipeline,
+    build_ivf_index, build_compressed_store, build_feature_database
+)
+
+def checkpoint_files():
+    """
+    Tranches sauvegardées dans Config.UPDATE_CHECKPOINT_DIR, dans l'ordre d'extraction
+    """
+    if not os.path.isdir(Config.UPDATE_CHECKPOINT_DIR):
+        return []
+    return [os.path.join(Config.UPDATE_CHECKPOINT_DIR, name)
+            for name in sorted(os.listdir(Config.UPDATE_CHECKPOINT_DIR)) if name.endswith('.npz')]
+
+def load_checkpoint(to_extract):
+    """
+    Reprendre une mise à jour interrompue : features déjà extraites des images
+    à traiter, si le fichier n'a pas changé depuis (même mtime et même taille)
+
+    Args:
+        to_extract (list): Chemins des images à extraire
+
+    Returns:
+        dict: {image_path: (features ou None si échec, signature)}
+    """
+    wanted = set(to_extract)
+    done = {}
+    for chunk_file in checkpoint_files():
+        with np.load(chunk_file) as data:
+            for path, ok, features, mtime, size, sha1 in zip(
+                data['paths'], data['ok'], data['features'], data['mtimes'], data['sizes'], data['sha1s']
+            ):
+                path = str(path)
+                if path not in wanted or not os.path.exists(path):
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime != mtime or stat.st_size != size:
+                    continue
+                signature = {'mtime': float(mtime), 'size': int(size), 'sha1': str(sha1)}
+                done[path] = (features if ok else None, signature)
+
+    return done
+
+def save_checkpoint(chunk_done, chunk_index, dimension):
+    """
+    Sauvegarder (de façon atomique) les features d'une tranche dans son propre
+    fichier : chaque point de reprise n'écrit que la tranche qui vient d'être extraite
+
+    Args:
+        chunk_done (dict): {image_path: (features ou None si échec, signature)} de la tranche
+        chunk_index (int): Numéro de la tranche (nom du fichier)
+        dimension (int): Dimension des features
+    """
+    paths = list(chunk_done)
+    features = np.zeros((len(paths), dimension), dtype=np.float32)
+    for i, path in enumerate(paths):
+        if chunk_done[path][0] is not None:
+            features[i] = chunk_done[path][0]
+
+    signatures = [chunk_done[path][1] for path in paths]
+    os.makedirs(Config.UPDATE_CHECKPOINT_DIR, exist_ok=True)
+    chunk_file = os.path.join(Config.UPDATE_CHECKPOINT_DIR, f'chunk_{chunk_index:06d}.npz')
+    atomic_write(chunk_file, lambda f: np.savez(
+        f,
+        paths=np.array(paths, dtype=str),
+        ok=np.array([chunk_done[path][0] is not None for path in paths], dtype=bool),
+        features=features,
+        mtimes=np.array([s['mtime'] for s in signatures], dtype=np.float64),
+        sizes=np.array([s['size'] for s in signatures], dtype=np.int64),
+        sha1s=np.array([s['sha1'] for s in signatures], dtype=str)
+    ))
+
+def extract_delta(extractor, to_extract, dimension):
+    """
+    Extraire les features des images nouvelles ou modifiées, par tranches,
+    avec un point de reprise après chaque tranche
+
+    Returns:
+        dict: {image_path: (features ou None si échec, signature)}
+    """
+    done = load_checkpoint(to_extract)
+    if done:
+        print(f"   ♻️  Reprise : {len(done)} images déjà extraites")
+
+    remaining = [path for path in to_extract if path not in done]
+    chunk_size = Config.UPDATE_CHECKPOINT_EVERY
+    first_chunk = len(checkpoint_files())  # Les tranches d'une reprise suivent les précédentes
+
+    for chunk_index, start in enumerate(range(0, len(remaining), chunk_size), start=first_chunk):
+        chunk = remaining[start:start + chunk_size]
+        features, valid, hashes = extract_features_pipeline(extractor, chunk)
+
+        chunk_done = {}
+        valid_rows = iter(features)
+        for path, ok, sha1 in zip(chunk, valid, hashes):
+            if ok:
+                chunk_done[path] = (next(valid_rows), file_signature(path, sha1))
+            else:
+                print(f"❌ Échec extraction : {path}")
+                chunk_done[path] = (None, file_signature(path))
+
+        save_checkpoint(chunk_done, chunk_index, dimension)
+        done.update(chunk_done)
+        print(f"   💾 Point de reprise : {len(done)} / {len(to_extract)} images")
+
+    return done
+
+def update_compressed_store(features_matrix, touched_rows, image_paths, compacted=False):
+    """
+    Mettre à jour les codes du stockage compressé : seules les lignes
+    modifiées ou ajoutées sont ré-encodées avec les codebooks existants
+    
+    Args:
+        features_matrix (numpy.ndarray): Matrice de features mise à jour
+        touched_rows (numpy.ndarray): Lignes modifiées (numérotation avant compactage)
+        image_paths (list): Chemins alignés sur les lignes
+        compacted (bool): Lignes supprimées retirées de la matrice
+    """
+    store_file = Config.INT8_STORE_FILE if Config.FEATURES_STORAGE == 'int8' else Config.PQ_STORE_FILE
+    if not os.path.exists(store_file):
+        return build_compressed_store(features_matrix, image_paths)
+
+    store = load_compressed_store(store_file)
+    if store.kind != Config.FEATURES_STORAGE:
+        return build_compressed_store(features_matrix, image_paths)
+
+    n_old = store.codes.shape[0]
+    if compacted or n_old > features_matrix.shape[0]:
+        # Matrice compactée : les numéros de ligne (codes existants et lignes modifiées) ont changé
+        store.codes = store.encode(features_matrix)
+    else:
+        codes = np.empty((features_matrix.shape[0],) + store.codes.shape[1:], dtype=store.codes.dtype)
+        codes[:n_old] = store.codes
+        touched_rows = np.union1d(touched_rows, np.arange(n_old, features_matrix.shape[0])).astype(np.int64)
+        if len(touched_rows) > 0:
+            codes[touched_rows] = store.encode(features_matrix[touched_rows])
+        store.codes = codes
+
+    store.save(store_file)
+    print(f"   ✅ Stockage compressé mis à jour : {store_file}")
+    return store
+
+def update_feature_database():
+    """
+    Mettre à jour la base de features sans tout recalculer :
+    seules les images nouvelles ou modifiées passent dans le modèle,
+    les produits supprimés sont masqués (lignes « tombstone »)
+    """
+    print("=" * 70)
+    print("🔄 MISE À JOUR INCRÉMENTALE DE LA BASE DE FEATURES")
+    print("=" * 70)
+    start_time = time.perf_counter()
+
+    # 1. Charger les métadonnées et l'état de la dernière construction
+    metadata = load_build_metadata()
+    manifest = load_manifest(Config.FEATURES_MANIFEST_FILE)
+
+    required_files = (Config.FEATURES_MATRIX_FILE, Config.IMAGE_PATHS_FILE, Config.PRODUCTS_TABLE_FILE)
+    if manifest is None or not all(os.path.exists(path) for path in required_files):
+        print("\n   ⚠️  Aucune base existante avec manifest : construction complète")
+        return build_feature_database()
+    if manifest['model'] != Config.MODEL_NAME:
+        print(f"\n   ⚠️  Base construite avec {manifest['model']} : construction complète")
+        return build_feature_database()
+
+    # Les nouvelles images sont projetées comme la matrice existante
+    projection = None
+    if os.path.exists(Config.PROJECTION_FILE):
+        projection = PCAProjection.load(Config.PROJECTION_FILE)
+    built_with = (projection.dim, projection.whiten) if projection is not None else None
+    configured = (Config.PCA_DIM, Config.PCA_WHITEN) if Config.PCA_DIM else None
+    if built_with != configured:
+        print("\n   ⚠️  Projection PCA différente de la configuration : construction complète")
+        return build_feature_database()
+
+    features_matrix = np.load(Config.FEATURES_MATRIX_FILE)
+    with open(Config.IMAGE_PATHS_FILE, 'rb') as f:
+        image_paths = pickle.load(f)
+    table_products = list(ProductCatalog.load(Config.PRODUCTS_TABLE_FILE).products)
+    signatures = manifest['files']
+
+    # Fichiers remplacés un par un : un arrêt pendant la sauvegarde peut les désaligner
+    if not features_matrix.shape[0] == len(image_paths) == len(table_products):
+        print(f"\n   ⚠️  Fichiers désalignés ({features_matrix.shape[0]} lignes, {len(image_paths)} chemins, "
+              f"{len(table_products)} produits) : construction complète")
+        return build_feature_database()
+
+    # 2. Comparer le catalogue avec la base existante
+    print("\n🔍 Détection des changements...")
+    row_of = {path: row for row, (path, product) in enumerate(zip(image_paths, table_products))
+              if product is not None}
+
+    products = {}
+    for product in metadata['products']:
+        if os.path.exists(product['image_path']):
+            products[product['image_path']] = product
+        else:
+            print(f"⚠️  Image non trouvée : {product['image_path']}")
+
+    new_paths = [path for path in products if path not in row_of]
+    deleted_paths = [path for path in row_of if path not in products]
+    changed_paths = []
+    for path in products:
+        if path not in row_of:
+            continue
+        if path not in signatures:
+            changed_paths.append(path)
+            continue
+        changed, signatures[path] = has_changed(path, signatures[path])
+        if changed:
+            changed_paths.append(path)
+
+    print(f"   • Nouvelles images : {len(new_paths)}")
+    print(f"   • Images modifiées : {len(changed_paths)}")
+    print(f"   • Produits supprimés : {len(deleted_paths)}")
+
+    # 3. Extraire uniquement les features des images nouvelles ou modifiées
+    done = {}
+    to_extract = changed_paths + new_paths
+    if to_extract:
+        print(f"\n⚙️  Extraction de {len(to_extract)} images...")
+        extractor = FeatureExtractor(Config.MODEL_NAME, projection=projection)
+        done = extract_delta(extractor, to_extract, features_matrix.shape[1])
+
+    # 4. Appliquer les changements : remplacement, ajout, suppression
+    for path in deleted_paths:
+        table_products[row_of[path]] = None
+        signatures.pop(path, None)
+
+    # Les métadonnées (prix, stock...) des produits conservés sont toujours rafraîchies
+    for path, row in row_of.items():
+        if path in products:
+            table_products[row] = products[path]
+
+    touched_rows = []
+    for path in changed_paths:
+        features, signature = done[path]
+        row = row_of[path]
+        if features is None:
+            # Image devenue illisible : le produit n'est plus indexé
+            table_products[row] = None
+            signatures.pop(path, None)
+            continue
+        features_matrix[row] = features
+        signatures[path] = signature
+        touched_rows.append(row)
+
+    added = [path for path in new_paths if done[path][0] is not None]
+    if added:
+        features_matrix = np.concatenate([features_matrix, np.stack([done[path][0] for path in added])])
+        image_paths = image_paths + added
+        table_products += [products[path] for path in added]
+        for path in added:
+            signatures[path] = done[path][1]
+
+    # 5. Compacter si trop de lignes supprimées
+    n_deleted = sum(product is None for product in table_products)
+    compacted = n_deleted > 0 and n_deleted / len(table_products) > Config.UPDATE_COMPACT_RATIO
+    if compacted:
+        print(f"\n🧹 Compactage : {n_deleted} lignes supprimées retirées")
+        keep = [row for row, product in enumerate(table_products) if product is not None]
+        features_matrix = features_matrix[keep]
+        image_paths = [image_paths[row] for row in keep]
+        table_products = [table_products[row] for row in keep]
+    deleted = np.array([product is None for product in table_products], dtype=bool)
+
+    # 6. Sauvegarder les données
+    print(f"\n💾 Sauvegarde des données...")
+    save_feature_files(features_matrix, image_paths, table_products, metadata['categories'])
+
+    # 7. Mettre à jour l'index et le stockage compressé
+    ivf_index = None
+    if Config.SEARCH_INDEX == 'ivf':
+        if os.path.exists(Config.IVF_INDEX_FILE):
+            # Centroïdes conservés : seules les listes sont recalculées
+            ivf_index = IVFIndex.load(Config.IVF_INDEX_FILE).fill(features_matrix)
+            ivf_index.save(Config.IVF_INDEX_FILE)
+            print(f"   ✅ Index IVF mis à jour : {Config.IVF_INDEX_FILE}")
+        else:
+            ivf_index = build_ivf_index(features_matrix, image_paths)
+
+    compressed_store = None
+    if Config.FEATURES_STORAGE in ('int8', 'pq'):
+        compressed_store = update_compressed_store(
+            features_matrix, np.array(touched_rows, dtype=np.int64), image_paths, compacted=compacted
+        )
+
+    search_engine = SimilaritySearch(
+        features_matrix=features_matrix,
+        image_paths=image_paths,
+        metric='cosine',
+        index=ivf_index,
+        store=compressed_store,
+        rerank_factor=Config.RERANK_FACTOR,
+        deleted=deleted
+    )
+    search_engine.save_data(os.path.join(Config.FEATURES_DIR, 'search_engine.pkl'))
+
+    # Le manifest est écrit en dernier : une mise à jour interrompue sera reprise
+    save_manifest(Config.FEATURES_MANIFEST_FILE, signatures, Config.MODEL_NAME)
+    shutil.rmtree(Config.UPDATE_CHECKPOINT_DIR, ignore_errors=True)
+
+    # 8. Récapitulatif
+    print("\n" + "=" * 70)
+    print("✅ BASE DE FEATURES MISE À JOUR !")
+    print("=" * 70)
+    print(f"   • Images extraites : {len(to_extract)}")
+    print(f"   • Lignes : {features_matrix.shape[0]} (dont {int(deleted.sum())} supprimées)")
+    print(f"   • Compactage : {'Oui' if compacted else 'Non'}")
+    print(f"   • Durée : {time.perf_counter() - start_time:.1f} s")
+    print("=" * 70 + "\n")
+
+    return features_matrix, image_paths
+
+if __name__ == '__main__':
+    update_feature_database()
@@ -0,0 +1,204 @@
+import numpy as np
+
+from utils.manifest import atomic_write
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def assign_to_centroids(features_matrix, centroids, chunk_size=10000):
+    """
+    Affecter chaque ligne au centroïde le plus proche (produit scalaire maximal)
+
+    Args:
+        features_matrix (numpy.ndarray): Matrice (n, dimension)
+        centroids (numpy.ndarray): Centroïdes normalisés (n_lists, dimension)
+        chunk_size (int): Lignes traitées par bloc (limite la mémoire)
+
+    Returns:
+        numpy.ndarray: Numéro de liste de chaque ligne (n,)
+    """
+    assignments = np.empty(features_matrix.shape[0], dtype=np.int32)
+    for start in range(0, features_matrix.shape[0], chunk_size):
+        block = np.asarray(features_matrix[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(features_matrix, n_clusters, n_iter=20, sample_size=50000, seed=0):
+    """
+    K-means sphérique (vecteurs normalisés, similarité cosinus) en NumPy
+
+    Args:
+        features_matrix (numpy.ndarray): Matrice (n, dimension)
+        n_clusters (int): Nombre de centroïdes
+        n_iter (int): Nombre d'itérations
+        sample_size (int): Nombre de lignes utilisées pour l'entraînement
+        seed (int): Graine aléatoire
+
+    Returns:
+        numpy.ndarray: Centroïdes normalisés (n_clusters, dimension)
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = features_matrix.shape[0]
+
+    if n_rows > sample_size:
+        sample = np.asarray(features_matrix[np.sort(rng.choice(n_rows, sample_size, replace=False))])
+    else:
+        sample = np.asarray(features_matrix)
+    sample = _normalize_rows(sample.astype(np.float32))
+
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_to_centroids(sample, centroids)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Réinitialiser les clusters vides sur des points aléatoires
+        empty = np.flatnonzero(counts == 0)
+        if len(empty) > 0:
+            sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+
+        centroids = _normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Index approximatif IVF (inverted file) :
+    un quantificateur grossier k-means répartit le catalogue en listes,
+    et une requête ne score que les lignes des `nprobe` listes les plus proches
+    """
+
+    def __init__(self, n_lists=100, nprobe=8):
+        """
+        Args:
+            n_lists (int): Nombre de listes (centroïdes k-means)
+            nprobe (int): Nombre de listes visitées par requête (rappel vs latence)
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.centroids = None
+        # Listes stockées à plat : les lignes de la liste i sont
+        # list_rows[list_offsets[i]:list_offsets[i + 1]]
+        self.list_offsets = None
+        self.list_rows = None
+
+    @staticmethod
+    def default_n_lists(n_rows):
+        """
+        Nombre de listes conseillé (~ 4 * racine(n)), borné par la taille du catalogue
+        """
+        return int(max(1, min(n_rows, round(4 * np.sqrt(n_rows)))))
+
+    def build(self, features_matrix, n_iter=20, seed=0):
+        """
+        Entraîner le quantificateur grossier puis remplir les listes
+
+        Args:
+            features_matrix (numpy.ndarray): Matrice de features (n, dimension)
+            n_iter (int): Itérations du k-means
+            seed (int): Graine aléatoire
+        """
+        self.n_lists = int(min(self.n_lists, features_matrix.shape[0]))
+        self.centroids = spherical_kmeans(features_matrix, self.n_lists, n_iter=n_iter, seed=seed)
+        return self.fill(features_matrix)
+
+    def fill(self, features_matrix):
+        """
+        Répartir les lignes dans les listes avec les centroïdes existants
+        (sans ré-entraînement, ex. après une mise à jour incrémentale)
+        """
+        assignments = assign_to_centroids(features_matrix, self.centroids)
+        self.list_rows = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return self
+
+    def candidates(self, query_features, nprobe=None):
+        """
+        Lignes candidates pour une requête : contenu des `nprobe` listes les plus proches
+
+        Args:
+            query_features (numpy.ndarray): Vecteur requête (normalisé)
+            nprobe (int): Nombre de listes visitées (défaut : self.nprobe)
+
+        Returns:
+            numpy.ndarray: Indices des lignes candidates
+        """
+        nprobe = min(int(nprobe or self.nprobe), self.n_lists)
+        centroid_scores = self.centroids @ np.asarray(query_features, dtype=np.float32)
+
+        if nprobe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.n_lists)
+
+        return np.concatenate([
+            self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ])
+
+    def matches(self, n_rows, dimension):
+        """
+        Index construit sur une matrice de cette forme (sinon fichier d'une ancienne construction)
+
+        Args:
+            n_rows (int): Nombre de lignes de la matrice servie
+            dimension (int): Dimension des vecteurs (après projection éventuelle)
+
+        Returns:
+            bool: True si les listes couvrent exactement les lignes de la matrice
+        """
+        return (self.centroids.shape[1] == dimension
+                and len(self.list_rows) == n_rows
+                and (n_rows == 0 or int(self.list_rows.max()) < n_rows))
+
+    def save(self, file_path):
+        atomic_write(file_path, lambda f: np.savez(
+            f,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            nprobe=np.int64(self.nprobe)
+        ))
+
+    @staticmethod
+    def load(file_path, nprobe=None):
+        with np.load(file_path) as data:
+            index = IVFIndex(n_lists=data['centroids'].shape[0], nprobe=int(data['nprobe']))
+            index.centroids = data['centroids']
+            index.list_offsets = data['list_offsets']
+            index.list_rows = data['list_rows']
+
+        if nprobe is not None:
+            index.nprobe = nprobe
+        return index
+
+
+def recall_at_k(exact_results, approx_results):
+    """
+    Rappel@k moyen : proportion des voisins exacts retrouvés par la recherche approximative
+
+    Args:
+        exact_results (list[list[SearchResult]]): Résultats de la recherche exacte
+        approx_results (list[list[SearchResult]]): Résultats de la recherche approximative
+
+    Returns:
+        float: Rappel moyen entre 0 et 1
+    """
+    recalls = []
+    for exact, approx in zip(exact_results, approx_results):
+        if len(exact) == 0:
+            continue
+        exact_rows = {result.row for result in exact}
+        recalls.append(len(exact_rows.intersection(result.row for result in approx)) / len(exact_rows))
+
+    return float(np.mean(recalls)) if recalls else 0.0
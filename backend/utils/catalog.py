@@ -0,0 +1,222 @@
+import re
+
+import numpy as np
+
+_PRICE_PATTERN = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def image_url_for(image_path):
+    """
+    Convertir le chemin d'une image en URL servie par l'API
+
+    Args:
+        image_path (str): Chemin de l'image (séparateurs Windows ou Unix)
+
+    Returns:
+        str: URL '/images/products/...' ou '/images/preprocessed/...', None sinon
+    """
+    path = image_path.replace('\\', '/')
+    for folder in ('products', 'preprocessed'):
+        marker = f'data/{folder}/'
+        if marker in path:
+            return f'/images/{folder}/{path.split(marker)[-1]}'
+    return None
+
+
+def parse_price(value):
+    """
+    Prix numérique d'un produit ('27.99 €', '27,99', 27.99)
+
+    Returns:
+        float: Prix, nan s'il est absent ou illisible
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _PRICE_PATTERN.search(str(value or ''))
+    return float(match.group().replace(',', '.')) if match else float('nan')
+
+
+class ProductView(dict):
+    """
+    Produit en lecture seule, partagé entre toutes les requêtes.
+    Sous-classe de dict : sérialisé directement par jsonify, sans copie.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_product(cls, product):
+        """
+        Créer la vue d'un produit en calculant son URL une seule fois
+        """
+        if isinstance(product, cls):
+            return product
+        view = dict(product)
+        view['image_url'] = image_url_for(view['image_path'])
+        return cls(view)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("ProductView est en lecture seule (utilisez .copy())")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (ProductView, (dict(self),))
+
+
+def freeze_products(products):
+    """
+    Convertir une liste de produits (métadonnées JSON) en vues en lecture seule
+
+    Returns:
+        tuple: ProductView de chaque produit
+    """
+    return tuple(ProductView.from_product(product) for product in products)
+
+
+class ProductCatalog:
+    """
+    Table des produits alignée sur la matrice de features :
+    la ligne i de la matrice correspond au produit catalog[i]
+    """
+
+    def __init__(self, products):
+        """
+        Args:
+            products (list | ProductDatabase): Produits dans l'ordre des lignes de la matrice
+                (None pour une ligne sans produit). Une ProductDatabase est gardée
+                telle quelle : les produits sont lus à la demande.
+        """
+        if isinstance(products, (list, tuple)):
+            self.products = [
+                ProductView.from_product(product) if product is not None else None
+                for product in products
+            ]
+            columns = {
+                'valid': np.array([product is not None for product in self.products], dtype=bool),
+                'id': [product.get('id') if product is not None else None for product in self.products],
+                'category': [product.get('category') if product is not None else None for product in self.products],
+                'price': np.array([parse_price(product.get('price')) if product is not None else np.nan
+                                   for product in self.products], dtype=np.float32),
+                'in_stock': np.array([bool(product.get('in_stock', False)) if product is not None else False
+                                      for product in self.products], dtype=bool),
+                'image_path': [product['image_path'] if product is not None else None for product in self.products]
+            }
+        else:
+            self.products = products
+            columns = products.columns()
+        self._build_filters(columns)
+
+    def _build_filters(self, columns):
+        """
+        Colonnes des attributs filtrables : lignes de chaque catégorie
+        (partitions triées), prix et disponibilité de chaque ligne,
+        et ligne de chaque identifiant produit
+        
+        Args:
+            columns (dict): 'valid', 'id', 'category', 'price', 'in_stock', 'image_path'
+                (une valeur par ligne)
+        """
+        self.valid_rows = np.flatnonzero(columns['valid']).astype(np.int64)
+        self.deleted = ~columns['valid']
+        self.prices = columns['price']
+        self.in_stock = columns['in_stock']
+        self._image_paths = columns['image_path']
+
+        rows_by_category = {}
+        self.row_of_id = {}  # {id produit: ligne}
+        for row in self.valid_rows.tolist():
+            rows_by_category.setdefault(columns['category'][row], []).append(row)
+            if columns['id'][row] is not None:
+                self.row_of_id[columns['id'][row]] = row
+
+        self.rows_by_category = {
+            category: np.array(rows, dtype=np.int64) for category, rows in rows_by_category.items()
+        }
+
+    def filter_rows(self, categories=None, min_price=None, max_price=None, in_stock=None):
+        """
+        Lignes des produits correspondant aux filtres
+
+        Args:
+            categories (list): Catégories acceptées (None = toutes)
+            min_price (float): Prix minimum (inclus)
+            max_price (float): Prix maximum (inclus)
+            in_stock (bool): Disponibilité demandée (None = indifférent)
+
+        Returns:
+            numpy.ndarray: Lignes triées (éventuellement vide), None si aucun filtre
+        """
+        if categories is None and min_price is None and max_price is None and in_stock is None:
+            return None
+
+        if categories is not None:
+            partitions = [self.rows_by_category[c] for c in dict.fromkeys(categories) if c in self.rows_by_category]
+            if not partitions:
+                return np.empty(0, dtype=np.int64)
+            rows = np.sort(np.concatenate(partitions)) if len(partitions) > 1 else partitions[0]
+        else:
+            rows = self.valid_rows
+
+        # Attributs : masque vectorisé sur les seules lignes retenues
+        mask = np.ones(len(rows), dtype=bool)
+        if min_price is not None:
+            mask &= self.prices[rows] >= min_price
+        if max_price is not None:
+            mask &= self.prices[rows] <= max_price
+        if in_stock is not None:
+            mask &= self.in_stock[rows] == in_stock
+        return rows if mask.all() else rows[mask]
+
+    @classmethod
+    def from_metadata(cls, products, image_paths):
+        """
+        Reconstruire l'alignement à partir des métadonnées (anciennes bases sans table)
+
+        Args:
+            products (list): Produits des métadonnées
+            image_paths (list): Chemins des images dans l'ordre de la matrice
+        """
+        by_path = {product['image_path']: product for product in products}
+        return cls([by_path.get(path) for path in image_paths])
+
+    def __len__(self):
+        return len(self.products)
+
+    def __getitem__(self, row):
+        return self.products[row]
+
+    def check_alignment(self, image_paths, n_rows):
+        """
+        Vérifier que la table correspond à la matrice de features et aux chemins
+
+        Raises:
+            ValueError: Si les fichiers ne proviennent pas de la même construction
+        """
+        if len(self.products) != n_rows or len(image_paths) != n_rows:
+            raise ValueError(
+                f"Table des produits ({len(self.products)}), chemins ({len(image_paths)}) "
+                f"et matrice ({n_rows} lignes) désalignés : relancez build_features_database.py"
+            )
+
+        for row, (product_path, path) in enumerate(zip(self._image_paths, image_paths)):
+            if product_path is not None and product_path != path:
+                raise ValueError(
+                    f"Ligne {row} : le produit {product_path} ne correspond pas à {path}"
+                )
+
+    def save(self, file_path):
+        """
+        Sauvegarder la table dans une base SQLite (écriture atomique)
+        """
+        from utils.database import ProductDatabase  # utils.database dépend de ce module
+        ProductDatabase.build(file_path, self.products)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Ouvrir une table sauvegardée : les produits sont lus à la demande
+        """
+        from utils.database import ProductDatabase
+        return cls(ProductDatabase(file_path))
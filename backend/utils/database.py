@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+
+from utils.catalog import ProductView, parse_price
+from utils.search_state import files_version
+
+
+class ProductDatabase(Sequence):
+    """
+    Stockage binaire des produits (SQLite) avec accès paresseux par ligne :
+    seuls les produits demandés sont lus et décodés, au lieu de charger
+    tout le JSON des métadonnées en mémoire au démarrage.
+
+    Se comporte comme une séquence en lecture seule de ProductView
+    (None pour une ligne sans produit) : len(), db[i], db[a:b], itération.
+    Les colonnes filtrables (catégorie, prix, stock, id) sont lues d'un bloc
+    sous forme de tableaux NumPy.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE products (
+            row INTEGER PRIMARY KEY,
+            id INTEGER,
+            name TEXT,
+            category TEXT,
+            description TEXT,
+            price REAL,
+            in_stock INTEGER,
+            image_path TEXT,
+            data TEXT
+        );
+        CREATE INDEX products_id ON products (id);
+        CREATE INDEX products_category ON products (category);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    '''
+
+    def __init__(self, db_file):
+        """
+        Args:
+            db_file (str): Fichier SQLite créé par ProductDatabase.build
+        """
+        self.db_file = db_file
+        self._local = threading.local()  # Une connexion (lecture seule) par thread
+        self._length = self._query('SELECT COUNT(*) FROM products')[0][0]
+
+    @staticmethod
+    def build(db_file, products, source=None):
+        """
+        Écrire les produits dans un fichier SQLite (fichier temporaire puis
+        os.replace : les lecteurs ouverts gardent l'ancienne version)
+
+        Args:
+            db_file (str): Fichier de destination
+            products (iterable): Produits dans l'ordre des lignes (None = ligne sans produit)
+            source (str): Version du fichier source (détection d'une base obsolète)
+        """
+        tmp_file = f'{db_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+        connection = sqlite3.connect(tmp_file)
+        try:
+            connection.executescript(ProductDatabase.SCHEMA)
+
+            def rows():
+                for row, product in enumerate(products):
+                    if product is None:
+                        yield (row, None, None, None, None, None, None, None, None)
+                        continue
+                    view = ProductView.from_product(product)
+                    yield (
+                        row, view.get('id'), view.get('name'), view.get('category'), view.get('description'),
+                        parse_price(view.get('price')), int(bool(view.get('in_stock', False))),
+                        view.get('image_path'), json.dumps(view, ensure_ascii=False)
+                    )
+
+            connection.executemany('INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows())
+            connection.execute("INSERT INTO meta VALUES ('source', ?)", (source,))
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(tmp_file, db_file)
+
+    @classmethod
+    def from_json(cls, json_file, db_file=None):
+        """
+        Ouvrir la base correspondant à un fichier de métadonnées JSON,
+        en la (re)construisant si elle est absente ou plus ancienne que le JSON
+
+        Args:
+            json_file (str): Métadonnées ({'products': [...]})
+            db_file (str): Base SQLite (défaut : même nom que le JSON, extension .db)
+
+        Returns:
+            ProductDatabase: Base à jour
+        """
+        db_file = db_file or os.path.splitext(json_file)[0] + '.db'
+        source = files_version([json_file])
+
+        if not os.path.exists(db_file) or cls(db_file).meta('source') != source:
+            print(f"   🔨 Conversion de {os.path.basename(json_file)} -> {os.path.basename(db_file)}...")
+            with open(json_file, 'r', encoding='utf-8') as f:
+                products = json.load(f)['products']
+            cls.build(db_file, products, source=source)
+
+        return cls(db_file)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f'file:{self.db_file}?mode=ro', uri=True, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _decode(data):
+        return ProductView(json.loads(data)) if data is not None else None
+
+    def meta(self, key):
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0][0] if rows else None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._length)
+            if step != 1:
+                return [self[row] for row in range(start, stop, step)]
+            return self.rows(range(start, stop))
+
+        row = int(item)
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError(f"Ligne {item} hors de la base ({self._length} produits)")
+        return self._decode(self._query('SELECT data FROM products WHERE row = ?', (row,))[0][0])
+
+    def rows(self, rows):
+        """
+        Lire plusieurs lignes en une requête
+
+        Args:
+            rows (iterable): Numéros de ligne
+
+        Returns:
+            list: ProductView (ou None) dans l'ordre demandé
+        """
+        rows = [int(row) for row in rows]
+        if not rows:
+            return []
+        if isinstance(rows, list) and rows == list(range(rows[0], rows[0] + len(rows))):
+            found = dict(self._query(
+                'SELECT row, data FROM products WHERE row >= ? AND row < ?', (rows[0], rows[0] + len(rows))
+            ))
+        else:
+            found = {}
+            # Limite SQLite du nombre de paramètres par requête
+            for start in range(0, len(rows), 500):
+                block = rows[start:start + 500]
+                found.update(self._query(
+                    f'SELECT row, data FROM products WHERE row IN ({",".join("?" * len(block))})', block
+                ))
+        return [self._decode(found.get(row)) for row in rows]
+
+    def __iter__(self, batch_size=1000):
+        for start in range(0, self._length, batch_size):
+            yield from self.rows(range(start, min(start + batch_size, self._length)))
+
+    def select(self, fields):
+        """
+        Parcourir quelques champs de tous les produits sans décoder le JSON complet
+
+        Args:
+            fields (iterable): Colonnes parmi id, name, category, description, image_path
+
+        Returns:
+            generator: Un dictionnaire {champ: valeur} par ligne, dans l'ordre des lignes
+        """
+        fields = list(fields)
+        cursor = self._connection().execute(f'SELECT {", ".join(fields)} FROM products ORDER BY row')
+        for values in cursor:
+            yield dict(zip(fields, values))
+
+    def categories(self):
+        """
+        Returns:
+            list: Catégories distinctes, triées
+        """
+        return [row[0] for row in self._query(
+            'SELECT DISTINCT category FROM products WHERE category IS NOT NULL ORDER BY category'
+        )]
+
+    def columns(self):
+        """
+        Colonnes des attributs filtrables, pour toutes les lignes
+
+        Returns:
+            dict: Tableaux NumPy 'valid', 'id', 'category', 'price', 'in_stock', 'image_path'
+        """
+        data = self._query(
+            'SELECT data IS NOT NULL, id, category, price, in_stock, image_path FROM products ORDER BY row'
+        )
+        valid, ids, categories, prices, in_stock, image_paths = zip(*data) if data else ((),) * 6
+        return {
+            'valid': np.array(valid, dtype=bool),
+            'id': list(ids),
+            'category': list(categories),
+            'price': np.array([np.nan if p is None else p for p in prices], dtype=np.float32),
+            'in_stock': np.array([bool(s) for s in in_stock], dtype=bool),
+            'image_path': list(image_paths)
+        }
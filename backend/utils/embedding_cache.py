@@ -0,0 +1,208 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.manifest import atomic_write
+
+
+class EmbeddingCache:
+    """
+    Cache des vecteurs de requête, indexé par l'empreinte du contenu de l'image
+    (et la version du modèle) : une image renvoyée à l'identique ne repasse pas
+    dans le modèle.
+
+    - Mémoire : LRU borné à `max_entries`, entrées expirées après `ttl` secondes
+    - Disque (optionnel) : un fichier .npy par vecteur dans `disk_dir`,
+      partagé entre les workers d'une même machine
+    - Résultats (optionnel) : top-k d'une requête pour une version de l'index
+    """
+
+    def __init__(self, model_version, max_entries=1024, ttl=3600, disk_dir=None,
+                 disk_max_entries=100000, cache_results=True):
+        """
+        Args:
+            model_version (str): Version du modèle (incluse dans la clé)
+            max_entries (int): Nombre max de vecteurs en mémoire
+            ttl (float): Durée de vie d'une entrée en secondes (None = illimitée)
+            disk_dir (str): Dossier du cache partagé sur disque (None = désactivé)
+            disk_max_entries (int): Nombre max de fichiers sur disque
+            cache_results (bool): Garder aussi les résultats de recherche
+        """
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.cache_results = cache_results
+
+        self._lock = threading.Lock()
+        self._vectors = OrderedDict()  # {clé: (vecteur, expiration)}
+        self._results = OrderedDict()  # {(clé, version index, paramètres): (résultats, expiration)}
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.result_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, data):
+        """
+        Clé d'une image : sha1 de la version du modèle et du contenu du fichier
+
+        Args:
+            data (bytes): Contenu du fichier image
+        """
+        digest = hashlib.sha1(self.model_version.encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _expiry(self):
+        return time.monotonic() + self.ttl if self.ttl else None
+
+    def _lookup(self, entries, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del entries[key]
+            self.expirations += 1
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _insert(self, entries, key, value):
+        entries[key] = (value, self._expiry())
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """
+        Vecteur en cache pour une image
+
+        Returns:
+            numpy.ndarray: Vecteur de features (lecture seule), None si absent
+        """
+        with self._lock:
+            vector = self._lookup(self._vectors, key)
+            if vector is not None:
+                self.hits += 1
+                return vector
+
+        vector = self._disk_get(key)
+        with self._lock:
+            if vector is not None:
+                self.disk_hits += 1
+                self._insert(self._vectors, key, vector)
+            else:
+                self.misses += 1
+        return vector
+
+    def put(self, key, vector):
+        """
+        Ajouter le vecteur d'une image au cache (mémoire et disque)
+        """
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False  # Partagé entre les requêtes
+        with self._lock:
+            self._insert(self._vectors, key, vector)
+        self._disk_put(key, vector)
+
+    def get_results(self, key, index_version, params):
+        """
+        Résultats en cache pour une image, une version de l'index et des paramètres
+        de recherche (top_k, filtres... : tuple hashable)
+
+        Returns:
+            list: Résultats de recherche, None si absents
+        """
+        if not self.cache_results:
+            return None
+        with self._lock:
+            results = self._lookup(self._results, (key, index_version, params))
+            if results is not None:
+                self.result_hits += 1
+            return results
+
+    def put_results(self, key, index_version, params, results):
+        if not self.cache_results:
+            return
+        with self._lock:
+            self._insert(self._results, (key, index_version, params), tuple(results))
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.npy')
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if self.ttl and os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            vector = np.load(path)
+        except (OSError, ValueError):
+            return None
+        vector.flags.writeable = False
+        return vector
+
+    def _disk_put(self, key, vector):
+        if not self.disk_dir:
+            return
+        try:
+            # Écriture atomique : un autre worker ne lit jamais un fichier partiel
+            atomic_write(self._disk_path(key), lambda f: np.save(f, vector))
+        except OSError as e:
+            print(f"⚠️  Cache disque indisponible : {e}")
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """
+        Supprimer les fichiers les plus anciens au-delà de disk_max_entries
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith('.npy')]
+            if len(entries) <= self.disk_max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.disk_max_entries]:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+    def stats(self):
+        """
+        Returns:
+            dict: Compteurs du cache, sérialisables en JSON
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._vectors),
+                'result_entries': len(self._results),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                'result_hits': self.result_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'disk': self.disk_dir is not None
+            }
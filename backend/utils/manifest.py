@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def sha1_of_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def sha1_of_file(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(file_path, sha1=None):
+    """
+    Signature d'une image : date de modification, taille et empreinte du contenu
+
+    Args:
+        file_path (str): Chemin de l'image
+        sha1 (str): Empreinte déjà calculée (évite de relire le fichier)
+
+    Returns:
+        dict: {'mtime', 'size', 'sha1'}
+    """
+    stat = os.stat(file_path)
+    return {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': sha1 or sha1_of_file(file_path)
+    }
+
+
+def has_changed(file_path, signature):
+    """
+    Détecter une image modifiée : comparaison rapide mtime/taille,
+    puis empreinte du contenu seulement si elles diffèrent
+
+    Returns:
+        tuple: (modifiée (bool), signature à jour)
+    """
+    stat = os.stat(file_path)
+    if stat.st_mtime == signature['mtime'] and stat.st_size == signature['size']:
+        return False, signature
+
+    current = file_signature(file_path)
+    return current['sha1'] != signature['sha1'], current
+
+
+def atomic_write(file_path, write, mode='wb'):
+    """
+    Écrire un fichier de façon atomique (fichier temporaire puis os.replace) :
+    un arrêt brutal ne laisse jamais un fichier à moitié écrit
+
+    Args:
+        file_path (str): Fichier de destination
+        write (callable): Fonction recevant le fichier ouvert
+        mode (str): 'wb' ou 'w'
+    """
+    # Suffixe propre au processus / thread : plusieurs écrivains possibles (cache partagé)
+    tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    encoding = None if 'b' in mode else 'utf-8'
+    with open(tmp_path, mode, encoding=encoding) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def save_manifest(file_path, signatures, model_name):
+    """
+    Sauvegarder les signatures des images indexées
+
+    Args:
+        file_path (str): Fichier manifest (JSON)
+        signatures (dict): {image_path: signature}
+        model_name (str): Modèle ayant produit les features
+    """
+    manifest = {'model': model_name, 'files': signatures}
+    atomic_write(file_path, lambda f: json.dump(manifest, f), mode='w')
+
+
+def load_manifest(file_path):
+    """
+    Returns:
+        dict: Manifest {'model', 'files'}, None s'il n'existe pas
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
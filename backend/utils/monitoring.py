@@ -0,0 +1,69 @@
+import os
+import time
+
+
+def memory_usage_mb():
+    """
+    Mémoire résidente du processus courant
+
+    Returns:
+        tuple: (rss_mb, shared_mb) ou (None, None) si indisponible (hors Linux).
+            La partie partagée inclut les pages des fichiers memmap,
+            communes à tous les workers via le cache du système.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            fields = f.read().split()
+        page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        return int(fields[1]) * page_mb, int(fields[2]) * page_mb
+    except (OSError, ValueError, AttributeError):
+        return None, None
+
+
+class StartupTimer:
+    """
+    Mesurer la durée de chaque étape du démarrage et la mémoire résidente
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.stages = []  # [(nom, durée en secondes)]
+
+    def stage(self, name):
+        """
+        Terminer l'étape courante
+
+        Args:
+            name (str): Nom de l'étape
+        """
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.start
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Étapes dans l'ordre (nom, durée en ms) et temps de démarrage, sérialisables en JSON
+        """
+        return {
+            'stages': [{'name': name, 'ms': round(duration * 1000, 1)} for name, duration in self.stages],
+            'startup_s': round(self.total, 3)
+        }
+
+    def report(self):
+        """
+        Afficher le temps de démarrage par étape et la mémoire du worker
+        """
+        print(f"⏱️  Démarrage du worker (pid {os.getpid()}) :")
+        for name, duration in self.stages:
+            print(f"   • {name:<20} {duration * 1000:>9.1f} ms")
+
+        rss_mb, shared_mb = memory_usage_mb()
+        if rss_mb is not None:
+            print(f"   📦 Mémoire résidente : {rss_mb:.1f} MB (dont {shared_mb:.1f} MB partagés)")
+        print(f"✅ API prête en {self.total:.2f} s\n")
@@ -0,0 +1,114 @@
+import json
+import time
+
+import numpy as np
+
+from utils.manifest import atomic_write
+
+
+class NeighbourTable:
+    """
+    Table précalculée des produits similaires : pour chaque ligne de la matrice,
+    les lignes de ses `k` plus proches voisins (int32, -1 = pas de voisin)
+    et leurs scores (float16), soit 6 octets par voisin
+    """
+
+    def __init__(self, rows, scores, source_version=None):
+        """
+        Args:
+            rows (numpy.ndarray): Lignes des voisins (n, k)
+            scores (numpy.ndarray): Similarités correspondantes (n, k)
+            source_version (str): Version de la matrice de features utilisée
+        """
+        self.rows = rows
+        self.scores = scores
+        self.source_version = source_version
+
+    @property
+    def k(self):
+        return self.rows.shape[1]
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    @classmethod
+    def build(cls, search_engine, k=20, batch_size=512, chunk_size=None, source_version=None):
+        """
+        Calculer les voisins de toutes les lignes par produits matriciels par blocs
+        (lot de `batch_size` lignes x bloc de `chunk_size` lignes du catalogue)
+
+        Args:
+            search_engine (SimilaritySearch): Moteur exact (sans index ni stockage compressé)
+            k (int): Nombre de voisins gardés par produit
+            batch_size (int): Lignes requêtes par lot
+            chunk_size (int): Lignes du catalogue scorées par bloc
+            source_version (str): Version de la matrice de features
+
+        Returns:
+            NeighbourTable: Table construite
+        """
+        matrix = search_engine.features_matrix
+        n_rows = matrix.shape[0]
+        rows = np.full((n_rows, k), -1, dtype=np.int32)
+        scores = np.zeros((n_rows, k), dtype=np.float16)
+
+        start_time = time.perf_counter()
+        for start in range(0, n_rows, batch_size):
+            stop = min(start + batch_size, n_rows)
+            queries = np.asarray(matrix[start:stop], dtype=np.float32)
+            # k + 1 : le produit lui-même fait partie des résultats
+            batch_results = search_engine.find_similar_batch(queries, k + 1, chunk_size=chunk_size)
+
+            for row, results in zip(range(start, stop), batch_results):
+                neighbours = [result for result in results if result.row != row][:k]
+                rows[row, :len(neighbours)] = [result.row for result in neighbours]
+                scores[row, :len(neighbours)] = [result.score for result in neighbours]
+
+            elapsed = time.perf_counter() - start_time
+            print(f"\r   ⚙️  {stop} / {n_rows} produits ({stop / elapsed:.0f} produits/s)", end='', flush=True)
+        print()
+
+        return cls(rows, scores, source_version)
+
+    def neighbours(self, row, top_k=None, deleted=None):
+        """
+        Voisins d'une ligne (lecture directe, sans calcul)
+
+        Args:
+            row (int): Ligne du produit
+            top_k (int): Nombre de voisins (défaut : tous)
+            deleted (numpy.ndarray): Masque des lignes supprimées depuis la construction
+
+        Returns:
+            tuple: (lignes, scores) des voisins, du plus proche au plus éloigné
+        """
+        rows = self.rows[row]
+        scores = self.scores[row]
+        valid = rows >= 0
+        if deleted is not None:
+            valid &= ~deleted[np.maximum(rows, 0)]
+        rows, scores = rows[valid], scores[valid]
+        if top_k is not None:
+            top_k = max(top_k, 0)  # Un top_k négatif ne doit pas couper par la fin
+            rows, scores = rows[:top_k], scores[:top_k]
+        return rows, scores.astype(np.float32)
+
+    def save(self, rows_file, scores_file, meta_file):
+        atomic_write(rows_file, lambda f: np.save(f, self.rows))
+        atomic_write(scores_file, lambda f: np.save(f, self.scores))
+        meta = {'k': self.k, 'n_rows': len(self), 'source_version': self.source_version}
+        atomic_write(meta_file, lambda f: json.dump(meta, f), mode='w')
+
+    @staticmethod
+    def load(rows_file, scores_file, meta_file, mmap=True):
+        """
+        Charger une table sauvegardée (en memmap : pages partagées entre workers)
+        """
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        return NeighbourTable(
+            np.load(rows_file, mmap_mode=mmap_mode),
+            np.load(scores_file, mmap_mode=mmap_mode),
+            meta.get('source_version')
+        )
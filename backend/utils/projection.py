@@ -0,0 +1,125 @@
+import numpy as np
+
+
+class PCAProjection:
+    """
+    Réduction de dimension par PCA : les vecteurs sont projetés sur les `dim`
+    premières composantes principales, optionnellement blanchies (vecteurs
+    centrés, variance unitaire par composante), puis renormalisés (norme L2)
+    pour rester comparables par similarité cosinus.
+    """
+
+    def __init__(self, dim=256, whiten=False, chunk_size=16384):
+        """
+        Args:
+            dim (int): Dimension après projection
+            whiten (bool): Diviser chaque composante par son écart-type
+            chunk_size (int): Lignes projetées par bloc (limite la mémoire)
+        """
+        self.dim = dim
+        self.whiten = whiten
+        self.chunk_size = chunk_size
+        self.mean = None                      # Moyenne retirée avant projection (nulle sans blanchiment)
+        self.components = None                # (dimension d'entrée, dim) float32
+        self.explained_variance_ratio = None  # Part de variance de chaque composante gardée
+
+    @property
+    def input_dim(self):
+        return self.components.shape[0]
+
+    def fit(self, features_matrix, sample_size=50000, seed=0):
+        """
+        Estimer les composantes principales sur un échantillon de la matrice
+
+        Args:
+            features_matrix (numpy.ndarray): Matrice de features (n, dimension)
+            sample_size (int): Nombre max de lignes utilisées
+            seed (int): Graine aléatoire de l'échantillonnage
+
+        Returns:
+            PCAProjection: self
+        """
+        n_rows, input_dim = features_matrix.shape
+        if self.dim > input_dim:
+            raise ValueError(f"Dimension de projection {self.dim} > dimension des features {input_dim}")
+
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(n_rows, min(sample_size, n_rows), replace=False))
+        sample = np.asarray(features_matrix[rows], dtype=np.float64)
+
+        # Sans blanchiment, vecteurs non centrés : la projection conserve au mieux
+        # les produits scalaires, donc le classement par similarité cosinus.
+        # Avec blanchiment, PCA classique sur les vecteurs centrés.
+        self.mean = sample.mean(axis=0) if self.whiten else np.zeros(input_dim)
+        centered = sample - self.mean
+        covariance = centered.T @ centered / max(len(sample) - 1, 1)
+
+        # Valeurs propres par ordre décroissant
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:self.dim]
+        eigenvalues = np.maximum(eigenvalues, 0.0)
+        kept = eigenvalues[order]
+
+        components = eigenvectors[:, order]
+        if self.whiten:
+            components = components / np.sqrt(kept + 1e-12)
+
+        self.mean = self.mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.explained_variance_ratio = (kept / max(eigenvalues.sum(), 1e-12)).astype(np.float32)
+        return self
+
+    def truncate(self, dim):
+        """
+        Projection sur les `dim` premières composantes seulement (sans nouvel apprentissage)
+
+        Returns:
+            PCAProjection: Nouvelle projection
+        """
+        projection = PCAProjection(dim=dim, whiten=self.whiten, chunk_size=self.chunk_size)
+        projection.mean = self.mean
+        projection.components = self.components[:, :dim]
+        projection.explained_variance_ratio = self.explained_variance_ratio[:dim]
+        return projection
+
+    def transform(self, vectors):
+        """
+        Projeter des vecteurs (par blocs : la matrice peut être un memmap)
+
+        Args:
+            vectors (numpy.ndarray): Vecteur (dimension d'entrée,) ou matrice (n, dimension d'entrée)
+
+        Returns:
+            numpy.ndarray: Vecteur (dim,) ou matrice (n, dim) float32, normalisés (norme L2)
+        """
+        single = vectors.ndim == 1
+        if single:
+            vectors = vectors[np.newaxis]
+
+        projected = np.empty((vectors.shape[0], self.dim), dtype=np.float32)
+        for start in range(0, vectors.shape[0], self.chunk_size):
+            block = np.asarray(vectors[start:start + self.chunk_size], dtype=np.float32) - self.mean
+            block = block @ self.components
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            projected[start:start + len(block)] = block / norms
+
+        return projected[0] if single else projected
+
+    def save(self, file_path):
+        np.savez(
+            file_path,
+            mean=self.mean,
+            components=self.components,
+            explained_variance_ratio=self.explained_variance_ratio,
+            whiten=np.bool_(self.whiten)
+        )
+
+    @staticmethod
+    def load(file_path):
+        with np.load(file_path) as data:
+            projection = PCAProjection(dim=data['components'].shape[1], whiten=bool(data['whiten']))
+            projection.mean = data['mean']
+            projection.components = data['components']
+            projection.explained_variance_ratio = data['explained_variance_ratio']
+        return projection
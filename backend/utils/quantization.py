@@ -0,0 +1,244 @@
+import numpy as np
+
+from utils.manifest import atomic_write
+
+
+def kmeans(data, n_clusters, n_iter=15, seed=0):
+    """
+    K-means (distance euclidienne) en NumPy, utilisé pour les sous-espaces du PQ
+
+    Args:
+        data (numpy.ndarray): Données d'entraînement (n, dimension)
+        n_clusters (int): Nombre de centroïdes
+        n_iter (int): Nombre d'itérations
+        seed (int): Graine aléatoire
+
+    Returns:
+        numpy.ndarray: Centroïdes (n_clusters, dimension)
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    data_norms = np.einsum('ij,ij->i', data, data)
+
+    for _ in range(n_iter):
+        # ||x - c||² = ||x||² - 2 x.c + ||c||²
+        distances = (data_norms[:, np.newaxis] - 2.0 * (data @ centroids.T)
+                     + np.einsum('ij,ij->i', centroids, centroids)[np.newaxis, :])
+        assignments = np.argmin(distances, axis=1)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled][:, np.newaxis]
+        # Clusters vides : réinitialisés sur des points aléatoires
+        empty = np.flatnonzero(~filled)
+        if len(empty) > 0:
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+    return centroids
+
+
+class ScalarQuantizer:
+    """
+    Quantification scalaire int8 par dimension (4x moins de mémoire que float32)
+    """
+
+    kind = 'int8'
+
+    def __init__(self, chunk_size=16384):
+        self.chunk_size = chunk_size
+        self.offsets = None  # Valeur minimale par dimension
+        self.scales = None   # Pas de quantification par dimension
+        self.codes = None    # (n, dimension) int8
+
+    def build(self, features_matrix):
+        """
+        Calculer les bornes par dimension puis encoder toute la matrice
+        """
+        vmin = np.full(features_matrix.shape[1], np.inf, dtype=np.float32)
+        vmax = np.full(features_matrix.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, features_matrix.shape[0], self.chunk_size):
+            block = np.asarray(features_matrix[start:start + self.chunk_size], dtype=np.float32)
+            vmin = np.minimum(vmin, block.min(axis=0))
+            vmax = np.maximum(vmax, block.max(axis=0))
+
+        self.offsets = vmin
+        self.scales = np.where(vmax > vmin, (vmax - vmin) / 255.0, 1.0).astype(np.float32)
+        self.codes = self.encode(features_matrix)
+        return self
+
+    def encode(self, features_matrix):
+        codes = np.empty(features_matrix.shape, dtype=np.int8)
+        for start in range(0, features_matrix.shape[0], self.chunk_size):
+            block = np.asarray(features_matrix[start:start + self.chunk_size], dtype=np.float32)
+            levels = np.rint((block - self.offsets) / self.scales) - 128
+            codes[start:start + len(block)] = np.clip(levels, -128, 127)
+        return codes
+
+    def decode(self, rows):
+        return (self.codes[rows].astype(np.float32) + 128) * self.scales + self.offsets
+
+    def score(self, query, rows=None):
+        """
+        Produits scalaires approximatifs requête / lignes encodées
+
+        Args:
+            query (numpy.ndarray): Vecteur requête float32
+            rows (numpy.ndarray): Lignes à scorer (None = toutes)
+
+        Returns:
+            numpy.ndarray: Scores approximatifs
+        """
+        # q.x ≈ q.offsets + 128 * (q * scales).1 + codes.(q * scales)
+        weights = query * self.scales
+        constant = float(np.dot(query, self.offsets) + 128.0 * weights.sum())
+
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.chunk_size):
+            block = codes[start:start + self.chunk_size]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weights
+        return scores + constant
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.offsets.nbytes + self.scales.nbytes
+
+    @property
+    def dimension(self):
+        return self.offsets.shape[0]
+
+    def save(self, file_path):
+        atomic_write(file_path, lambda f: np.savez(
+            f, kind=self.kind, codes=self.codes, offsets=self.offsets, scales=self.scales
+        ))
+
+    @classmethod
+    def _from_arrays(cls, data):
+        quantizer = cls()
+        quantizer.codes = data['codes']
+        quantizer.offsets = data['offsets']
+        quantizer.scales = data['scales']
+        return quantizer
+
+
+class ProductQuantizer:
+    """
+    Quantification produit (PQ) : le vecteur est découpé en `m` sous-vecteurs,
+    chacun remplacé par le numéro (1 octet) du centroïde le plus proche.
+    Les scores sont calculés par tables de distances asymétriques (ADC).
+    """
+
+    kind = 'pq'
+
+    def __init__(self, m=256, n_centroids=256, chunk_size=16384):
+        """
+        Args:
+            m (int): Nombre de sous-espaces (octets par vecteur)
+            n_centroids (int): Centroïdes par sous-espace (256 max, codes sur 1 octet)
+        """
+        self.m = m
+        self.n_centroids = n_centroids
+        self.chunk_size = chunk_size
+        self.codebooks = None  # (m, n_centroids, dimension / m)
+        self.codes = None      # (n, m) uint8
+
+    def build(self, features_matrix, sample_size=20000, n_iter=15, seed=0):
+        """
+        Entraîner un k-means par sous-espace puis encoder toute la matrice
+        """
+        n_rows, dim = features_matrix.shape
+        if dim % self.m != 0:
+            raise ValueError(f"La dimension {dim} n'est pas divisible par m={self.m}")
+        dsub = dim // self.m
+
+        rng = np.random.default_rng(seed)
+        if n_rows > sample_size:
+            sample = np.asarray(features_matrix[np.sort(rng.choice(n_rows, sample_size, replace=False))])
+        else:
+            sample = np.asarray(features_matrix)
+        sample = sample.astype(np.float32).reshape(len(sample), self.m, dsub)
+
+        n_centroids = min(self.n_centroids, len(sample))
+        self.codebooks = np.stack([
+            kmeans(sample[:, j, :], n_centroids, n_iter=n_iter, seed=seed + j)
+            for j in range(self.m)
+        ])
+        self.codes = self.encode(features_matrix)
+        return self
+
+    def encode(self, features_matrix):
+        codes = np.empty((features_matrix.shape[0], self.m), dtype=np.uint8)
+        codebook_norms = np.einsum('mkd,mkd->mk', self.codebooks, self.codebooks)
+        # Le tableau de distances (bloc, m, n_centroids) est limité à ~128 MB
+        chunk_size = max(1, 2 ** 25 // codebook_norms.size)
+
+        for start in range(0, features_matrix.shape[0], chunk_size):
+            block = np.asarray(features_matrix[start:start + chunk_size], dtype=np.float32)
+            block = block.reshape(len(block), self.m, -1)
+            # argmin ||x_j - c||² = argmin ||c||² - 2 x_j.c
+            distances = codebook_norms[np.newaxis] - 2.0 * np.einsum('nmd,mkd->nmk', block, self.codebooks)
+            codes[start:start + len(block)] = np.argmin(distances, axis=2)
+        return codes
+
+    def decode(self, rows):
+        codes = self.codes[rows]
+        return self.codebooks[np.arange(self.m), codes].reshape(len(codes), -1)
+
+    def score(self, query, rows=None):
+        """
+        Produits scalaires approximatifs requête / lignes encodées (ADC)
+
+        Args:
+            query (numpy.ndarray): Vecteur requête float32
+            rows (numpy.ndarray): Lignes à scorer (None = toutes)
+
+        Returns:
+            numpy.ndarray: Scores approximatifs
+        """
+        # Table (m, n_centroids) : produit scalaire du sous-vecteur requête avec chaque centroïde
+        table = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.m, -1))
+        subspaces = np.arange(self.m)
+
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.chunk_size):
+            block = codes[start:start + self.chunk_size]
+            scores[start:start + len(block)] = table[subspaces, block].sum(axis=1)
+        return scores
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.codebooks.nbytes
+
+    @property
+    def dimension(self):
+        return self.m * self.codebooks.shape[2]
+
+    def save(self, file_path):
+        atomic_write(file_path, lambda f: np.savez(f, kind=self.kind, codes=self.codes, codebooks=self.codebooks))
+
+    @classmethod
+    def _from_arrays(cls, data):
+        codebooks = data['codebooks']
+        quantizer = cls(m=codebooks.shape[0], n_centroids=codebooks.shape[1])
+        quantizer.codebooks = codebooks
+        quantizer.codes = data['codes']
+        return quantizer
+
+
+def load_compressed_store(file_path):
+    """
+    Charger un stockage compressé (int8 ou PQ) sauvegardé avec save()
+    """
+    with np.load(file_path) as data:
+        kind = str(data['kind'])
+        if kind == ScalarQuantizer.kind:
+            return ScalarQuantizer._from_arrays(data)
+        if kind == ProductQuantizer.kind:
+            return ProductQuantizer._from_arrays(data)
+
+    raise ValueError(f"Type de stockage inconnu : {kind}")
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import threading
+import time
+
+
+def files_version(file_paths):
+    """
+    Identifiant de version d'un ensemble de fichiers (date de modification et taille)
+
+    Args:
+        file_paths (list): Fichiers composant l'index
+
+    Returns:
+        str: Empreinte courte, différente dès qu'un fichier est remplacé
+    """
+    digest = hashlib.sha1()
+    for path in file_paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        except OSError:
+            digest.update(f'{path}:absent;'.encode())
+    return digest.hexdigest()[:12]
+
+
+def files_modified_at(file_paths):
+    """
+    Date de la dernière modification d'un ensemble de fichiers
+
+    Args:
+        file_paths (list): Fichiers composant l'index
+
+    Returns:
+        float: Timestamp du fichier le plus récent, None si aucun n'existe
+    """
+    mtimes = [os.path.getmtime(path) for path in file_paths if os.path.exists(path)]
+    return max(mtimes) if mtimes else None
+
+
+class SearchState:
+    """
+    Version chargée de l'index : moteur de recherche, table des produits alignée,
+    catalogue, index textuel et produits similaires précalculés. Jamais modifiée après sa création : une requête qui a lu
+    l'état courant termine sur cette version même si un rechargement a lieu.
+    """
+
+    def __init__(self, version, similarity_search, product_catalog, catalog_products,
+                 text_index=None, neighbours=None, categories=None, modified_at=None, projection=None):
+        """
+        Args:
+            version (str): Identifiant de version des fichiers chargés
+            similarity_search (SimilaritySearch): Moteur de recherche
+            product_catalog (ProductCatalog): Produits alignés sur les lignes de la matrice
+            catalog_products (tuple): Vues des produits du catalogue
+            text_index (TextIndex): Index inversé de catalog_products
+            neighbours (NeighbourTable): Voisins précalculés de chaque ligne (None si absents)
+            categories (list): Catégories distinctes du catalogue, triées
+            modified_at (float): Date de modification des fichiers chargés (en-tête Last-Modified)
+            projection (PCAProjection): Projection appliquée aux requêtes (None = vecteurs complets)
+        """
+        self.version = version
+        self.similarity_search = similarity_search
+        self.product_catalog = product_catalog
+        self.catalog_products = catalog_products
+        self.text_index = text_index
+        self.neighbours = neighbours
+        self.categories = categories
+        self.loaded_at = time.time()
+        self.modified_at = modified_at or self.loaded_at
+        self.projection = projection
+
+    @property
+    def dimension(self):
+        return self.similarity_search.features_matrix.shape[1]
+
+    @property
+    def model_dimension(self):
+        """
+        Dimension des vecteurs produits par le modèle (avant projection)
+        """
+        return self.projection.input_dim if self.projection is not None else self.dimension
+
+    def project(self, query_features):
+        """
+        Ramener des vecteurs de requête dans l'espace de l'index (projection PCA éventuelle)
+
+        Args:
+            query_features (numpy.ndarray): Vecteur (d,) ou matrice (n, d) du modèle
+
+        Returns:
+            numpy.ndarray: Vecteurs de même dimension que la matrice indexée
+        """
+        return self.projection.transform(query_features) if self.projection is not None else query_features
+
+
+class SearchStateManager:
+    """
+    Rechargement à chaud de l'index sans redémarrer l'API ni recharger le modèle.
+
+    La nouvelle version est chargée en arrière-plan puis remplace l'ancienne
+    par une simple affectation de référence (atomique) ; l'ancienne version
+    est libérée quand plus aucune requête ne l'utilise. En cas d'échec
+    (fichiers désalignés, dimension différente...), l'ancienne version reste servie.
+    """
+
+    def __init__(self, loader, version_fn, initial=None):
+        """
+        Args:
+            loader (callable): Fonction sans argument retournant un SearchState
+            version_fn (callable): Fonction retournant la version actuelle des fichiers sur disque
+            initial (SearchState): Version déjà chargée (sinon chargée par loader)
+        """
+        self.loader = loader
+        self.version_fn = version_fn
+        self.reloads = 0
+        self.last_error = None
+        self.last_duration = None
+        self._failed_version = None  # Version dont le chargement a échoué (pas de nouvel essai auto)
+
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._watcher = None
+        self._current = initial if initial is not None else loader()
+
+    @property
+    def current(self):
+        """
+        Version à utiliser pour toute la durée d'une requête
+        """
+        return self._current
+
+    @property
+    def reloading(self):
+        return self._reloading
+
+    def reload(self, wait=False):
+        """
+        Charger la version présente sur disque et l'activer
+
+        Args:
+            wait (bool): Attendre la fin du chargement (sinon thread en arrière-plan)
+
+        Returns:
+            bool: False si un rechargement est déjà en cours
+        """
+        with self._lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+
+        if wait:
+            self._reload()
+        else:
+            threading.Thread(target=self._reload, name='index-reload', daemon=True).start()
+        return True
+
+    def _reload(self):
+        start = time.perf_counter()
+        version = self.version_fn()
+        try:
+            state = self.loader()
+            if state.model_dimension != self._current.model_dimension:
+                raise ValueError(
+                    f"Dimension des features {state.model_dimension} != {self._current.model_dimension} : "
+                    f"index construit avec un autre modèle, redémarrez l'API"
+                )
+            self._current = state
+            self.reloads += 1
+            self.last_error = None
+            print(f"🔄 Index rechargé : version {state.version}")
+        except Exception as e:
+            self.last_error = str(e)
+            self._failed_version = version
+            print(f"❌ Échec du rechargement de l'index (ancienne version conservée) : {e}")
+        finally:
+            self.last_duration = time.perf_counter() - start
+            self._reloading = False
+
+    def reset_after_fork(self):
+        """
+        Remettre le gestionnaire en ordre dans un processus fils (ex. worker de
+        gunicorn --preload) : les threads du parent (surveillance, rechargement)
+        n'y existent pas et le verrou a pu être copié pendant un rechargement.
+        La surveillance est à relancer avec watch().
+        """
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._watcher = None
+
+    def watch(self, interval):
+        """
+        Surveiller les fichiers de l'index et recharger quand ils changent.
+        Avec plusieurs workers, chacun recharge sa propre version.
+
+        Args:
+            interval (float): Intervalle de vérification en secondes
+        """
+        if self._watcher is not None:
+            return
+
+        def run():
+            pending = None
+            while True:
+                time.sleep(interval)
+                version = self.version_fn()
+                if version == self._current.version or version == self._failed_version:
+                    pending = None
+                elif version == pending:
+                    # Version stable depuis un intervalle : écriture terminée
+                    self.reload(wait=True)
+                    pending = None
+                else:
+                    pending = version
+
+        self._watcher = threading.Thread(target=run, name='index-watcher', daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        """
+        Returns:
+            dict: État du rechargement, sérialisable en JSON
+        """
+        state = self._current
+        return {
+            'version': state.version,
+            'disk_version': self.version_fn(),
+            'loaded_at': state.loaded_at,
+            'products': len(state.catalog_products),
+            'rows': state.similarity_search.features_matrix.shape[0],
+            'reloading': self._reloading,
+            'reloads': self.reloads,
+            'last_reload_seconds': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None
+        }
@@ -24,7 +24,7 @@ def build_feature_database():
     print(f"   ✅ {metadata['total_products']} produits à traiter")
     
     # 2. Initialiser l'extracteur de features
-    print("\n🤖 Initialisation du modèle ResNet50...")
+    print(f"\n🤖 Initialisation du modèle {Config.MODEL_NAME}...")
     extractor = FeatureExtractor(Config.MODEL_NAME)
     
     # 3. Extraire les features de toutes les images
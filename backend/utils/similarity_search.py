@@ -1,23 +1,348 @@
 import numpy as np
 import pickle
+from typing import NamedTuple
+
+
+def sorted_isin(values, sorted_reference):
+    """
+    Masque des éléments de `values` présents dans `sorted_reference` (tableau trié)
+    """
+    if len(sorted_reference) == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_reference, values), len(sorted_reference) - 1)
+    return sorted_reference[positions] == values
+
+
+class SearchResult(NamedTuple):
+    """
+    Un résultat de recherche : chemin de l'image, score et ligne dans la matrice
+    """
+    image_path: str
+    score: float  # Similarité (cosine) ou distance (euclidean)
+    row: int
+
+
+def top_k_indices(scores, top_k, largest=True):
+    """
+    Sélection partielle des top_k meilleurs scores (argpartition + tri du top_k)
+
+    Args:
+        scores (numpy.ndarray): Vecteur de scores
+        top_k (int): Nombre d'indices à garder
+        largest (bool): True pour les plus grands scores, False pour les plus petits
+
+    Returns:
+        numpy.ndarray: Indices triés du meilleur au moins bon
+    """
+    n = scores.shape[0]
+    k = min(int(top_k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    keys = -scores if largest else scores
+    if k < n:
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+
+    return candidates[np.argsort(keys[candidates], kind='stable')]
+
+
+def top_k_indices_rows(scores, top_k, largest=True):
+    """
+    Sélection partielle ligne par ligne sur une matrice de scores (n_requêtes, n)
+
+    Returns:
+        numpy.ndarray: Indices (n_requêtes, k) triés du meilleur au moins bon
+    """
+    n = scores.shape[1]
+    k = min(int(top_k), n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    keys = -scores if largest else scores
+    if k < n:
+        candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+
+    order = np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
 
 class SimilaritySearch:
-    def __init__(self, features_matrix, image_paths, metric='cosine'):
+    """
+    Recherche des images les plus proches dans la matrice de features :
+    exacte (force brute), ou approximative si un index IVF et/ou un stockage
+    compressé (int8 / PQ) sont fournis. Dans ce cas, les candidats sont
+    re-classés avec les vecteurs float32 de la matrice.
+    """
+
+    def __init__(self, features_matrix, image_paths, metric='cosine', index=None,
+                 store=None, rerank_factor=10, deleted=None, exact_subset_max=20000):
+        """
+        Args:
+            features_matrix (numpy.ndarray): Matrice float32 (peut être un memmap)
+            image_paths (list): Chemins des images, alignés avec la matrice
+            metric (str): 'cosine' ou 'euclidean'
+            index (IVFIndex): Index IVF optionnel
+            store (ScalarQuantizer | ProductQuantizer): Stockage compressé optionnel
+            rerank_factor (int): Taille de la short-list re-classée = top_k * rerank_factor
+            deleted (numpy.ndarray): Masque booléen des lignes supprimées (jamais renvoyées)
+            exact_subset_max (int): Taille max d'un sous-ensemble filtré scoré exactement
+                (sans passer par l'index IVF / le stockage compressé)
+        """
         self.features_matrix = features_matrix
         self.image_paths = image_paths
         self.metric = metric
+        self.index = index
+        self.store = store
+        self.rerank_factor = rerank_factor
+        self.deleted = deleted if deleted is not None and deleted.any() else None
+        self.exact_subset_max = exact_subset_max
+        self._prepare()
+
+    def _prepare(self):
+        """
+        Préparer la matrice une seule fois (au lieu de le faire à chaque requête)
+        """
+        matrix = np.asarray(self.features_matrix, dtype=np.float32)
+
+        if self.store is not None:
+            # Mode compressé : la matrice float32 (memmap) ne sert qu'au re-classement
+            # de la short-list, on évite de la parcourir entièrement
+            self._matrix = matrix
+            self._squared_norms = None
+            self._prenormalized = False
+            return
+
+        if self.metric == 'cosine':
+            # Les vecteurs du FeatureExtractor sont déjà normalisés (norme L2) :
+            # on ne crée une copie normalisée que si ce n'est pas le cas
+            # (einsum évite la copie temporaire de toute la matrice, important en memmap)
+            norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+            if not np.allclose(norms, 1.0, atol=1e-3):
+                norms[norms == 0] = 1.0
+                matrix = matrix / norms[:, np.newaxis]
+            self._squared_norms = None
+        else:
+            # ||x - q||² = ||x||² - 2 x.q + ||q||²
+            self._squared_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+        self._matrix = matrix
+        self._prenormalized = True
+
+    def _prepare_query(self, query_features):
+        query = np.asarray(query_features, dtype=np.float32).ravel()
 
-    def find_similar(self, query_features, top_k=5):
         if self.metric == 'cosine':
-            similarities = np.dot(self.features_matrix, query_features) / (
-                np.linalg.norm(self.features_matrix, axis=1) * np.linalg.norm(query_features)
-            )
-            indices = np.argsort(similarities)[::-1][:top_k]
+            norm = np.linalg.norm(query)
+            if norm != 0:
+                query = query / norm
+        return query
+
+    def _score(self, query, rows=None):
+        """
+        Calculer les scores avec un seul produit matrice-vecteur
+        (toute la matrice, ou seulement les lignes `rows`)
+        """
+        matrix = self._matrix if rows is None else np.asarray(self._matrix[rows], dtype=np.float32)
+
+        if not self._prenormalized:
+            # Lignes non préparées (mode compressé) : normes calculées sur la short-list
+            squared_norms = np.einsum('ij,ij->i', matrix, matrix)
+            if self.metric == 'cosine':
+                norms = np.sqrt(squared_norms)
+                norms[norms == 0] = 1.0
+                return (matrix @ query) / norms
+        elif self.metric == 'cosine':
+            return matrix @ query
         else:
-            distances = np.linalg.norm(self.features_matrix - query_features, axis=1)
-            indices = np.argsort(distances)[:top_k]
+            squared_norms = self._squared_norms if rows is None else self._squared_norms[rows]
+
+        squared = squared_norms - 2.0 * (matrix @ query) + np.dot(query, query)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def _allowed_rows(self, subset):
+        """
+        Sous-ensemble filtré (lignes triées) privé des lignes supprimées
+        """
+        subset = np.asarray(subset, dtype=np.int64)
+        if self.deleted is not None:
+            subset = subset[~self.deleted[subset]]
+        return subset
+
+    def _search_rows(self, query, rows, top_k):
+        """
+        Recherche exacte limitée aux lignes `rows`
+        """
+        scores = self._score(query, rows)
+        local = top_k_indices(scores, top_k, largest=self.metric == 'cosine')
+        return self._results(rows[local], scores[local])
+
+    def find_similar(self, query_features, top_k=5, nprobe=None, subset=None):
+        """
+        Trouver les top_k images les plus proches d'un vecteur requête
+
+        Args:
+            query_features (numpy.ndarray): Vecteur de features de la requête
+            top_k (int): Nombre de résultats
+            nprobe (int): Listes visitées si un index IVF est utilisé (défaut : celui de l'index)
+            subset (numpy.ndarray): Lignes triées autorisées (filtres), None = tout le catalogue
+
+        Returns:
+            list[SearchResult]: Résultats triés du plus proche au plus éloigné
+        """
+        query = self._prepare_query(query_features)
+        largest = self.metric == 'cosine'
+
+        if subset is not None:
+            subset = self._allowed_rows(subset)
+            if len(subset) == 0:
+                return []
+            if (self.index is None and self.store is None) or len(subset) <= self.exact_subset_max:
+                # Filtre sélectif : seules les lignes du sous-ensemble sont scorées (exact)
+                return self._search_rows(query, subset, top_k)
+
+        if self.index is None and self.store is None:
+            scores = self._score(query)
+            if self.deleted is not None:
+                scores[self.deleted] = -np.inf if largest else np.inf
+            indices = top_k_indices(scores, top_k, largest=largest)
+            return self._results(indices, scores[indices])
+
+        # Recherche approximative : lignes candidates de l'index IVF (ou tout le catalogue)
+        rows = None
+        if self.index is not None:
+            if subset is not None:
+                # Filtre : visiter plus de listes pour garder autant de candidats autorisés
+                selectivity = len(subset) / self._matrix.shape[0]
+                nprobe = int(np.ceil((nprobe or self.index.nprobe) / selectivity))
+            rows = np.sort(self.index.candidates(query, nprobe=nprobe))
+            if self.deleted is not None:
+                rows = rows[~self.deleted[rows]]
+            if subset is not None:
+                rows = rows[sorted_isin(rows, subset)]
+                if len(rows) < top_k:
+                    # Listes visitées trop pauvres pour ce filtre : recherche exacte
+                    return self._search_rows(query, subset, top_k)
+        elif subset is not None:
+            rows = subset
+
+        if self.store is not None:
+            # Short-list sur les codes compressés (produit scalaire approximatif)
+            approx_scores = self.store.score(query, rows)
+            if rows is None and self.deleted is not None:
+                approx_scores[self.deleted] = -np.inf
+            shortlist = top_k_indices(approx_scores, top_k * self.rerank_factor, largest=True)
+            rows = np.sort(shortlist if rows is None else rows[shortlist])
+            if self.deleted is not None:
+                rows = rows[~self.deleted[rows]]
+
+        # Re-classement exact (float32) des seules lignes candidates
+        scores = self._score(query, rows)
+        local = top_k_indices(scores, top_k, largest=largest)
+
+        return self._results(rows[local], scores[local])
+
+    def _results(self, rows, scores):
+        """
+        Construire les SearchResult (les lignes supprimées, de score infini, sont ignorées)
+        """
+        return [
+            SearchResult(self.image_paths[row], float(score), int(row))
+            for row, score in zip(rows, scores) if np.isfinite(score)
+        ]
+
+    def _score_block(self, queries, start, stop, rows=None):
+        """
+        Scores d'un bloc de lignes du catalogue pour toutes les requêtes (un seul GEMM)
+        (lignes start:stop du catalogue, ou de `rows` si un sous-ensemble est donné)
+        """
+        block_rows = slice(start, stop) if rows is None else rows[start:stop]
+        block = self._matrix[block_rows]
+        products = queries @ block.T
+
+        if self.metric == 'cosine':
+            return products
+
+        squared = (self._squared_norms[block_rows][np.newaxis, :] - 2.0 * products
+                   + np.einsum('ij,ij->i', queries, queries)[:, np.newaxis])
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def find_similar_batch(self, queries, top_k=5, chunk_size=None, subset=None):
+        """
+        Trouver les top_k images les plus proches pour plusieurs requêtes à la fois
+
+        Args:
+            queries (numpy.ndarray): Matrice de requêtes (n_requêtes, dimension)
+            top_k (int): Nombre de résultats par requête
+            chunk_size (int): Nombre de lignes du catalogue scorées par bloc
+                (None = tout le catalogue en une fois). Limite la mémoire
+                à n_requêtes x chunk_size scores.
+            subset (numpy.ndarray): Lignes triées autorisées (filtres), None = tout le catalogue
+
+        Returns:
+            list[list[SearchResult]]: Résultats de chaque requête
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        largest = self.metric == 'cosine'
+
+        if self.index is not None or self.store is not None:
+            # Chaque requête a ses propres candidats : pas de GEMM commun
+            return [self.find_similar(query, top_k, subset=subset) for query in queries]
+
+        rows = None
+        if subset is not None:
+            rows = self._allowed_rows(subset)
+            if len(rows) == 0:
+                return [[] for _ in queries]
+
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            queries = queries / norms
+
+        n_rows = self._matrix.shape[0] if rows is None else len(rows)
+        chunk_size = n_rows if not chunk_size else int(chunk_size)
+
+        best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+        best_indices = np.empty((queries.shape[0], 0), dtype=np.int64)
+
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            scores = self._score_block(queries, start, stop, rows)
+            if rows is None and self.deleted is not None:
+                scores[:, self.deleted[start:stop]] = -np.inf if largest else np.inf
+
+            # Garder uniquement le top_k du bloc puis fusionner avec le top_k courant
+            local = top_k_indices_rows(scores, top_k, largest=largest)
+            merged_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, local, axis=1)], axis=1)
+            merged_indices = np.concatenate([best_indices, local + start], axis=1)
+
+            keep = top_k_indices_rows(merged_scores, top_k, largest=largest)
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_indices = np.take_along_axis(merged_indices, keep, axis=1)
+
+        if rows is not None:
+            best_indices = rows[best_indices]
+
+        return [
+            self._results(row_indices, row_scores)
+            for row_indices, row_scores in zip(best_indices, best_scores)
+        ]
 
-        return [(self.image_paths[i], similarities[i] if self.metric == 'cosine' else distances[i]) for i in indices]
+    def __setstate__(self, state):
+        # Compatibilité avec les anciens search_engine.pkl (sans matrice préparée)
+        self.__dict__.update(state)
+        self.__dict__.setdefault('index', None)
+        self.__dict__.setdefault('store', None)
+        self.__dict__.setdefault('rerank_factor', 10)
+        self.__dict__.setdefault('deleted', None)
+        self.__dict__.setdefault('exact_subset_max', 20000)
+        if '_matrix' not in state or '_prenormalized' not in state:
+            self._prepare()
 
     def save_data(self, file_path):
         with open(file_path, 'wb') as f:
@@ -26,4 +351,4 @@ class SimilaritySearch:
     @staticmethod
     def load_data(file_path):
         with open(file_path, 'rb') as f:
-            return pickle.load(f)
\ No newline at end of file
+            return pickle.load(f)
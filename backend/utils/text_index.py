@@ -0,0 +1,163 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Découper un texte en mots : minuscules, accents retirés
+
+    Args:
+        text (str): Texte libre
+
+    Returns:
+        list: Mots du texte ('Sac à main' -> ['sac', 'a', 'main'])
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_PATTERN.findall(text)
+
+
+class TextIndex:
+    """
+    Index inversé des produits pour la recherche textuelle, construit une fois
+    au chargement des métadonnées :
+    - score BM25, avec un poids par champ (nom > catégorie > description)
+    - correspondance par préfixe (saisie en cours : 'chau' -> 'chaussure')
+    - seuls les produits contenant tous les mots de la requête sont scorés
+    """
+
+    FIELDS = {'name': 3.0, 'category': 2.0, 'description': 1.0}
+
+    def __init__(self, products, fields=None, k1=1.2, b=0.75):
+        """
+        Args:
+            products (iterable): Produits indexés (le numéro de document est leur position),
+                dictionnaires contenant au moins les champs indexés
+            fields (dict): {champ: poids} (défaut : TextIndex.FIELDS)
+            k1 (float): Saturation de la fréquence des termes (BM25)
+            b (float): Normalisation par la longueur du document (BM25)
+        """
+        self.fields = fields or self.FIELDS
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(list)
+        doc_lengths = []
+
+        for doc, product in enumerate(products):
+            term_weights = Counter()
+            for field, weight in self.fields.items():
+                for token in tokenize(str(product.get(field) or '')):
+                    term_weights[token] += weight
+            doc_lengths.append(sum(term_weights.values()))
+            for term, tf in term_weights.items():
+                postings[term].append((doc, tf))
+
+        self.n_docs = len(doc_lengths)
+        doc_lengths = np.array(doc_lengths, dtype=np.float32)
+
+        # Listes triées par document : (documents int32, fréquences pondérées float32)
+        self.postings = {
+            term: (np.array([doc for doc, _ in entries], dtype=np.int32),
+                   np.array([tf for _, tf in entries], dtype=np.float32))
+            for term, entries in postings.items()
+        }
+        self.vocabulary = sorted(self.postings)
+        # Dénominateur BM25 précalculé : k1 * (1 - b + b * longueur / longueur moyenne)
+        avg_length = doc_lengths.mean() if self.n_docs else 1.0
+        self.length_norm = self.k1 * (1 - self.b + self.b * doc_lengths / max(avg_length, 1e-9))
+
+    def expand(self, token, prefix=True):
+        """
+        Mots du vocabulaire correspondant à un mot de la requête
+
+        Args:
+            token (str): Mot de la requête
+            prefix (bool): Accepter les mots commençant par `token`
+
+        Returns:
+            list: Mots de l'index (le mot exact en premier)
+        """
+        if not prefix:
+            return [token] if token in self.postings else []
+
+        # Vocabulaire trié : les mots de même préfixe sont consécutifs. Tous sont
+        # gardés, sinon les préfixes courts perdraient des produits (et le total)
+        start = bisect_left(self.vocabulary, token)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(token):
+            end += 1
+        return self.vocabulary[start:end]
+
+    def _token_scores(self, terms):
+        """
+        Score BM25 d'un mot de la requête pour chaque document qui le contient
+        (meilleure des expansions par préfixe)
+
+        Returns:
+            tuple: (documents triés, scores)
+        """
+        if len(terms) == 1:
+            docs, tfs = self.postings[terms[0]]
+            idf = np.log1p((self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            return docs, idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs])
+
+        # Fusion des listes de toutes les expansions : meilleur score par document
+        per_term = [self._token_scores([term]) for term in terms]
+        docs = np.concatenate([term_docs for term_docs, _ in per_term])
+        scores = np.concatenate([term_scores for _, term_scores in per_term])
+        order = np.lexsort((-scores, docs))
+        docs, scores = docs[order], scores[order]
+        first = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        return docs[first], scores[first]
+
+    def search(self, query, limit=20, offset=0, prefix=True):
+        """
+        Rechercher les produits contenant tous les mots de la requête
+
+        Args:
+            query (str): Texte recherché
+            limit (int): Nombre de résultats de la page
+            offset (int): Position du premier résultat (pagination)
+            prefix (bool): Correspondance par préfixe (saisie en cours)
+
+        Returns:
+            tuple: (documents de la page triés par score, scores, nombre total de correspondances)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or self.n_docs == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), 0
+
+        expansions = [self.expand(token, prefix) for token in tokens]
+        if any(len(terms) == 0 for terms in expansions):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), 0
+
+        # Commencer par le mot le plus rare : l'intersection reste petite
+        per_token = sorted((self._token_scores(terms) for terms in expansions), key=lambda item: len(item[0]))
+
+        docs, scores = per_token[0]
+        for token_docs, token_scores in per_token[1:]:
+            if len(docs) == 0:
+                break
+            mask = np.isin(docs, token_docs, assume_unique=True)
+            docs, scores = docs[mask], scores[mask]
+            scores = scores + token_scores[np.searchsorted(token_docs, docs)]
+
+        total = len(docs)
+        end = min(offset + limit, total)
+        if offset >= end:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), total
+
+        # Tri partiel : seuls les `end` meilleurs documents sont ordonnés
+        if end < total:
+            top = np.argpartition(-scores, end - 1)[:end]
+        else:
+            top = np.arange(total)
+        top = top[np.lexsort((docs[top], -scores[top]))][offset:end]
+        return docs[top], scores[top], total